@@ -0,0 +1,542 @@
+#!/bin/python3
+
+'''
+Koinly Bench: checks that the converters and the balance check still produce exactly the output of their frozen reference
+implementations (koinly_reference.py), and that they did not get slower or hungrier than allowed by koinly_bench_thresholds.json.
+
+Usage: koinly_bench.py [--rows=N] [--seed=N] [--repeat=N] [path/to/recorded_file.csv[,path/to/etherlink_tokens_transfer_file.csv] ...]
+
+Each case runs the reference and the optimized implementation on the same input: generated histories (N rows, seeded), plus the recorded
+input files given as arguments (one comma-separated set of files per conversion, detected like koinly_convert.py does).
+Outputs are compared row by row with exact amounts, including each amount decoded from the columnar sidecar against float() of its CSV cell.
+Throughput and peak memory ratios are always compared to the thresholds of the case: calls shorter than MIN_TIMED_SECONDS are repeated
+inside the timer until the reference run lasts at least that long, to keep timing noise out.
+
+Exits with status 1 when any output differs, any threshold is exceeded or the format of any recorded file set cannot be detected.
+
+Licence: EUPL 1.2 https://joinup.ec.europa.eu/sites/default/files/custom-page/attachment/2020-03/EUPL-1.2%20EN.txt
+Author: Vincent Poulain, 2022-2025
+'''
+
+from __future__ import annotations
+
+import csv
+import gc
+import io
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from typing import Callable
+
+import koinly_check
+import koinly_reference
+
+from koinly_columnar import NO_INDEX, ColumnarTable, ColumnarWriter, decodeAmount, sidecarPath
+from koinly_convert import CSV_DELIMITER_OUT, MODE_ETHERLINK, MODE_MERIA, detectConverter
+from koinly_converters import common, etherlink, meria
+
+
+BENCH_THRESHOLDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'koinly_bench_thresholds.json')
+
+DEFAULT_ROWS = 20000
+DEFAULT_SEED = 1
+DEFAULT_REPEAT = 5
+
+MIN_TIMED_SECONDS = 0.1
+MAX_REPORTED_DIFFS = 10
+
+OPTIONS = ('--rows', '--seed', '--repeat')
+
+AMOUNT_COLUMNS = (('sent', 1, 2), ('received', 3, 4), ('fee', 5, 6))
+LABEL_COLUMN = 9
+
+
+class BenchCase:
+    def __init__(
+            self,
+            name: str, source: str, rows: int,
+            setup: Callable[[], tuple],
+            reference: Callable, optimized: Callable,
+            normalize: Callable[[object], list]
+        ) -> None:
+        self.name = name
+        self.source = source
+        self.rows = rows
+        self.setup = setup
+        self.reference = reference
+        self.optimized = optimized
+        self.normalize = normalize
+
+
+def usage() -> None:
+    print(f'Usage: {sys.argv[0]} [--rows=N] [--seed=N] [--repeat=N] [path/to/recorded_file.csv[,path/to/etherlink_tokens_transfer_file.csv] ...]', file=sys.stderr)
+
+
+def csvText(rows: list[list[str]], delimiter: str) -> str:
+    output = io.StringIO()
+    csv.writer(output, delimiter = delimiter).writerows(rows)
+
+    return output.getvalue()
+
+
+def generateMeria(rng: random.Random, rows: int) -> str:
+    currencies = ('BTC', 'ETH', 'XTZ', 'LUNA', 'DOT', 'EUR')
+    lines = [['txHash', 'type', 'sourceAmount', 'sourceCurrency', 'destinationAmount', 'destinationCurrency', 'address', 'memo', 'destinationType', 'fee', 'info', 'date']]
+    txDate = datetime(2022, 1, 1)
+
+    amount = lambda: f'{rng.uniform(0, 10 ** rng.randint(0, 5)):.{rng.randint(0, 10)}f}' if rng.random() > 0.2 else f'{rng.uniform(0, 0.01):.8f}'
+    fee = lambda: rng.choice(('0', '0', '0.5', '1', '1.5'))
+
+    for idx in range(rows):
+        txDate += timedelta(seconds = rng.randint(1, 3600))
+        txHash = rng.choice(('n/a', f'0x{idx:08x}'))
+        txType = rng.choice(('credit', 'debit', 'exchange', 'withdraw'))
+        source = rng.choice(currencies)
+        destination = rng.choice(currencies)
+        txInfo = ''
+
+        if txType == 'credit':
+            txInfo = rng.choice(('airdrop', 'deposit', 'order', 'reward', 'unstaking', 'resale', 'claim'))
+
+        elif txType == 'debit':
+            txInfo = rng.choice(('masternode', 'order', 'reinvestment', 'staking'))
+
+        if rng.random() < 0.01:
+            txInfo = 'unknown'
+
+        lines.append([txHash, txType, amount(), source, amount(), destination, f'addr{idx}', '', 'wallet', fee(), txInfo, txDate.isoformat()])
+
+    return csvText(lines, ';')
+
+
+def generateEtherlink(rng: random.Random, rows: int) -> tuple[str, str]:
+    xtzLines = [['TxHash', 'BlockNumber', 'UnixTimestamp', 'FromAddress', 'ToAddress', 'ContractAddress', 'Type', 'Value', 'Fee', 'Status', 'ErrCode', 'CurrentPrice', 'TxDateOpeningPrice', 'TxDateClosingPrice', 'MethodName']]
+    tokenLines = [['TxHash', 'BlockNumber', 'UnixTimestamp', 'FromAddress', 'ToAddress', 'TokenContractAddressHash', 'Type', 'TokenDecimals', 'TokenSymbol', 'TokensTransferred', 'TransactionFee', 'Status', 'ErrCode']]
+    txDate = datetime(2024, 1, 1)
+    unwrapContract, unwrapRouter = next(iter(etherlink.ETHERLINK_RULES.unwraps), ('0xtoken', '0xother'))
+
+    amount = lambda: str(rng.randint(1, 10 ** rng.choice((6, 12, 18, 20))))
+    symbol = lambda expected: expected if rng.random() > 0.05 else 'OTHER'
+    status = lambda: 'ok' if rng.random() > 0.01 else 'error'
+
+    for idx in range(rows):
+        txDate += timedelta(seconds = rng.randint(1, 600))
+        txHash = f'0x{idx:064x}'
+        stamp = f'{txDate.isoformat()}.000000Z'
+
+        def xtz(value: str, method: str, txType: str = 'OUT') -> None:
+            xtzLines.append([txHash, idx, stamp, '0xme', '0xcontract', '', txType, value, str(rng.randint(0, 10 ** 15)), status(), '', '', '', '', method])
+
+        def token(txType: str, tokenSymbol: str, value: str, *, toAddress: str = '0xme', contract: str = '0xtoken', decimals: str = '18') -> None:
+            tokenLines.append([txHash, idx, stamp, '0xcontract', toAddress, contract, txType, decimals, tokenSymbol, value, '', status(), ''])
+
+        scenario = rng.randrange(10)
+
+        if scenario == 0:
+            value = amount()
+            xtz(value, 'depositETH')
+            token('IN', symbol('slWXTZ'), value)
+
+        elif scenario == 1:
+            value = amount()
+            xtz('0', 'supply')
+            token('OUT', symbol('USDC'), value, decimals = '6')
+            token('IN', symbol('slUSDC'), value, decimals = '6')
+
+        elif scenario == 2:
+            xtz('0', 'withdrawETH')
+            token('IN', symbol('slWXTZ'), amount())
+
+        elif scenario == 3:
+            value = amount()
+            xtz('0', 'withdraw')
+            token('OUT', symbol('slUSDC'), value, decimals = '6')
+            token('IN', symbol('USDC'), value, decimals = '6')
+
+        elif scenario == 4:
+            xtz(amount(), 'multicall')
+            token('IN', symbol('USDC'), amount(), decimals = '6')
+
+        elif scenario == 5:
+            xtz(amount(), 'bridge')
+            token('OUT', symbol('USDC'), amount(), decimals = '6')
+
+        elif scenario == 6:
+            xtz('0', 'exactInputSingle')
+            token('IN', symbol('xU3O8'), amount(), decimals = '6')
+            token('OUT', symbol('USDC'), amount(), decimals = '6')
+
+        elif scenario == 7:
+            decimals = rng.choice(('18', '6', ''))
+
+            token(
+                'OUT', rng.choice(('slWXTZ', 'slWBTC', 'USDC')), amount() if decimals else str(rng.randint(1, 10 ** 6)),
+                toAddress = rng.choice((unwrapRouter, '0xother')),
+                contract = rng.choice((unwrapContract, '0xtoken')),
+                decimals = decimals
+            )
+
+        elif scenario == 8:
+            xtz(amount(), 'deposit', 'IN')
+
+        else:
+            xtz(amount(), rng.choice(('', 'transfer')))
+
+    return csvText(xtzLines, ','), csvText(tokenLines, ',')
+
+
+def generateUnits(rng: random.Random, rows: int) -> list[tuple[str, str]]:
+    return [(str(rng.randint(1, 10 ** rng.randint(1, 30))), str(rng.choice((6, 8, 12, 18)))) for _ in range(rows)]
+
+
+def outputRows(lines: list) -> list[list[str]]:
+    return [['' if value is None else str(value) for value in line.toList()] for line in lines]
+
+
+def balanceRows(balanceChanges: dict) -> list[tuple[str, str]]:
+    return [(currency, repr(change)) for currency, change in balanceChanges.items()]
+
+
+def writeKoinlyFiles(directory: str, name: str, lines: list) -> tuple[str, bool]:
+    csvPath = os.path.join(directory, f'koinly_{name}.csv')
+
+    with open(csvPath, mode = 'w', newline = '') as outputFile:
+        writer = csv.writer(outputFile, delimiter = CSV_DELIMITER_OUT, quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(koinly_reference.OutputLine.headers().toList())
+        writer.writerows(line.toList() for line in lines)
+
+    columnarWriter = ColumnarWriter(sidecarPath(csvPath))
+
+    try:
+        for line in lines:
+            columnarWriter.append(line)
+
+    except ValueError:
+        return csvPath, False
+
+    columnarWriter.close()
+
+    return csvPath, True
+
+
+def referenceBalanceChanges(csvPath: str) -> dict:
+    with open(csvPath, newline = '') as inputFile:
+        return koinly_reference.balanceChangesFromCsv(inputFile)
+
+
+def optimizedCsvBalanceChanges(csvPath: str) -> dict:
+    with open(csvPath, newline = '') as inputFile:
+        return koinly_check.balanceChangesFromCsv(inputFile)
+
+
+def csvAmountRows(csvPath: str) -> list[tuple]:
+    def amount(row: list[str], amountColumn: int, currencyColumn: int) -> tuple[str, str]:
+        currency = row[currencyColumn]
+        value = float(row[amountColumn]) if currency and row[amountColumn] else 0.0
+
+        return (currency or None, repr(value) if value != 0 else None)
+
+    with open(csvPath, newline = '') as inputFile:
+        return [
+            tuple(amount(row, amountColumn, currencyColumn) for _, amountColumn, currencyColumn in AMOUNT_COLUMNS) + (row[LABEL_COLUMN],)
+                for row in koinly_reference.csvReader(inputFile, ';')
+        ]
+
+
+def columnarAmountRows(csvPath: str) -> list[tuple]:
+    with ColumnarTable(sidecarPath(csvPath)) as table:
+        columns = table.columns
+        currencies = table.currencies
+
+        def amounts(prefix: str) -> list[tuple[str, str]]:
+            return [
+                (currencies[currencyIndex] if currencyIndex != NO_INDEX else None, repr(value) if (value := decodeAmount(high, low, exponent)) != 0 else None)
+                    for currencyIndex, high, low, exponent in zip(columns[f'{prefix}Currency'], columns[f'{prefix}High'], columns[f'{prefix}Low'], columns[f'{prefix}Exponent'])
+            ]
+
+        return list(zip(*(amounts(prefix) for prefix, _, _ in AMOUNT_COLUMNS), (table.labels[labelIndex] for labelIndex in columns['label'])))
+
+
+def balanceCases(directory: str, name: str, source: str, lines: list) -> list[BenchCase]:
+    csvPath, columnar = writeKoinlyFiles(directory, name, lines)
+    setup = lambda: (csvPath,)
+    cases = [BenchCase('checkBalanceChanges (csv)', source, len(lines), setup, referenceBalanceChanges, optimizedCsvBalanceChanges, balanceRows)]
+
+    if columnar:
+        cases.append(BenchCase('columnar sidecar rows', source, len(lines), setup, csvAmountRows, columnarAmountRows, list))
+        cases.append(BenchCase('checkBalanceChanges (columnar)', source, len(lines), setup, referenceBalanceChanges, koinly_check.loadBalanceChanges, balanceRows))
+
+    else:
+        print(f'{source}: amounts out of the columnar sidecar range, columnar cases skipped.')
+
+    return cases
+
+
+def meriaCases(directory: str, name: str, source: str, text: str) -> list[BenchCase]:
+    rows = text.count('\n') - 1
+    setup = lambda: (io.StringIO(text, newline = ''),)
+
+    return [
+        BenchCase('convertMeria', source, rows, setup, koinly_reference.convertMeria, meria.convertMeria, outputRows),
+    ] + balanceCases(directory, name, source, koinly_reference.convertMeria(io.StringIO(text, newline = '')))
+
+
+def etherlinkCases(directory: str, name: str, source: str, xtzText: str, tokensText: str) -> list[BenchCase]:
+    rows = xtzText.count('\n') + tokensText.count('\n') - 2
+    setup = lambda: (io.StringIO(xtzText, newline = ''), io.StringIO(tokensText, newline = ''))
+
+    def consolidationSetup() -> tuple:
+        xtzFile, tokensFile = setup()
+
+        return (sorted(koinly_reference.convertEtherlinkXtz(xtzFile) + koinly_reference.convertEtherlinkTokens(tokensFile), key = lambda x: x.txDate),)
+
+    try:
+        lines = koinly_reference.convertEtherlink(*setup())
+
+    except Exception as err:
+        print(f'{source}: reference Etherlink conversion failed ({type(err).__name__}: {err}), balance check cases skipped.')
+        lines = None
+
+    return [
+        BenchCase('convertEtherlink', source, rows, setup, koinly_reference.convertEtherlink, etherlink.convert, outputRows),
+        BenchCase('consolidateEtherlink', source, rows, consolidationSetup, koinly_reference.consolidateEtherlink, etherlink.consolidateEtherlink, outputRows),
+    ] + (balanceCases(directory, name, source, lines) if lines is not None else [])
+
+
+def generatedCases(directory: str, rows: int, seed: int) -> list[BenchCase]:
+    source = f'generated, seed {seed}'
+    units = generateUnits(random.Random(seed), rows)
+    toUnitsCase = BenchCase(
+        'toUnits', source, rows, lambda: (units,),
+        lambda pairs: [koinly_reference.toUnits(*pair) for pair in pairs],
+        lambda pairs: [common.toUnits(*pair) for pair in pairs],
+        list
+    )
+
+    return (
+        [toUnitsCase] +
+        meriaCases(directory, 'generated_meria', f'{source}, Meria', generateMeria(random.Random(seed), rows)) +
+        etherlinkCases(directory, 'generated_etherlink', f'{source}, Etherlink', *generateEtherlink(random.Random(seed), rows))
+    )
+
+
+def recordedCases(directory: str, index: int, fileSet: str) -> list[BenchCase] | None:
+    filePaths = fileSet.split(',')
+
+    with ExitStack() as stack:
+        inputFiles = [stack.enter_context(open(filePath, newline = '')) for filePath in filePaths]
+        plugin, inputFiles = detectConverter(inputFiles)
+
+        if plugin is None:
+            print(f'FAIL {fileSet}: cannot detect the format of these recorded files.')
+            return None
+
+        texts = [inputFile.read() for inputFile in inputFiles]
+
+    name = f'recorded_{index}'
+
+    if plugin.mode == MODE_MERIA:
+        return meriaCases(directory, name, fileSet, *texts)
+
+    if plugin.mode == MODE_ETHERLINK:
+        return etherlinkCases(directory, name, fileSet, *texts)
+
+    print(f'FAIL {fileSet}: no reference implementation for mode {plugin.mode}.')
+    return None
+
+
+def outcome(function: Callable, args: tuple, normalize: Callable[[object], list]) -> tuple[str, object]:
+    try:
+        return 'ok', normalize(function(*args))
+
+    except Exception as err:
+        return 'error', f'{type(err).__name__}: {err}'
+
+
+def peakMemory(function: Callable, setup: Callable[[], tuple]) -> int:
+    args = setup()
+    tracemalloc.start()
+
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+
+def timedLoops(case: BenchCase) -> int:
+    args = case.setup()
+    start = time.perf_counter()
+    case.reference(*args)
+    elapsed = time.perf_counter() - start
+
+    return max(1, math.ceil(MIN_TIMED_SECONDS / elapsed)) if elapsed > 0 else 1
+
+
+def measure(case: BenchCase, repeat: int) -> tuple[float, float, int, int]:
+    loops = timedLoops(case)
+    referenceTime = float('inf')
+    optimizedTime = float('inf')
+
+    for _ in range(repeat):
+        for function, isReference in ((case.reference, True), (case.optimized, False)):
+            argsList = [case.setup() for _ in range(loops)]
+            gc.disable()
+            start = time.perf_counter()
+
+            try:
+                for args in argsList:
+                    function(*args)
+
+            finally:
+                elapsed = (time.perf_counter() - start) / loops
+                gc.enable()
+
+            if isReference:
+                referenceTime = min(referenceTime, elapsed)
+
+            else:
+                optimizedTime = min(optimizedTime, elapsed)
+
+    return referenceTime, optimizedTime, peakMemory(case.reference, case.setup), peakMemory(case.optimized, case.setup)
+
+
+def diffOutcomes(reference: tuple[str, object], optimized: tuple[str, object]) -> list[str]:
+    if reference[0] == 'error' or optimized[0] == 'error':
+        return [] if reference == optimized else [f'reference {reference[0]}: {reference[1] if reference[0] == "error" else "output"}, optimized {optimized[0]}: {optimized[1] if optimized[0] == "error" else "output"}']
+
+    referenceRows = reference[1]
+    optimizedRows = optimized[1]
+    diffs = []
+
+    for idx in range(max(len(referenceRows), len(optimizedRows))):
+        referenceRow = referenceRows[idx] if idx < len(referenceRows) else None
+        optimizedRow = optimizedRows[idx] if idx < len(optimizedRows) else None
+
+        if referenceRow != optimizedRow:
+            diffs.append(f'row {idx}: reference {referenceRow}, optimized {optimizedRow}')
+
+    return diffs
+
+
+def runCase(case: BenchCase, thresholds: dict, repeat: int) -> bool:
+    label = f'{case.name} [{case.source}]'
+    referenceOutcome = outcome(case.reference, case.setup(), case.normalize)
+    optimizedOutcome = outcome(case.optimized, case.setup(), case.normalize)
+    diffs = diffOutcomes(referenceOutcome, optimizedOutcome)
+
+    if len(diffs) > 0:
+        print(f'FAIL {label}: {len(diffs)} difference(s) over {case.rows} input rows')
+
+        for diff in diffs[:MAX_REPORTED_DIFFS]:
+            print(f'    {diff}')
+
+        return False
+
+    if referenceOutcome[0] == 'error':
+        print(f'ok   {label}: both implementations fail the same way ({referenceOutcome[1]}), not timed')
+        return True
+
+    referenceTime, optimizedTime, referencePeak, optimizedPeak = measure(case, repeat)
+
+    throughputRatio = referenceTime / optimizedTime if optimizedTime > 0 else float('inf')
+    peakMemoryRatio = optimizedPeak / referencePeak if referencePeak > 0 else 1.0
+
+    caseThresholds = thresholds.get(case.name, {})
+    minThroughputRatio = caseThresholds.get('minThroughputRatio')
+    maxPeakMemoryRatio = caseThresholds.get('maxPeakMemoryRatio')
+
+    failures = []
+
+    if minThroughputRatio is not None and throughputRatio < minThroughputRatio:
+        failures.append(f'throughput x{throughputRatio:.2f} below x{minThroughputRatio:.2f}')
+
+    if maxPeakMemoryRatio is not None and peakMemoryRatio > maxPeakMemoryRatio:
+        failures.append(f'peak memory x{peakMemoryRatio:.2f} above x{maxPeakMemoryRatio:.2f}')
+
+    print(
+        f'{"FAIL" if failures else "ok  "} {label}: identical output ({len(referenceOutcome[1])} rows), '
+        f'reference {referenceTime:.3f}s / {referencePeak / 1024:.0f} KiB, optimized {optimizedTime:.3f}s / {optimizedPeak / 1024:.0f} KiB, '
+        f'throughput x{throughputRatio:.2f}, peak memory x{peakMemoryRatio:.2f}'
+    )
+
+    for failure in failures:
+        print(f'    {failure}')
+
+    return len(failures) == 0
+
+
+def parseOptions(args: list[str]) -> tuple[dict[str, int], list[str]] | tuple[None, None]:
+    options = {}
+    positionals = []
+
+    for arg in args:
+        if arg.startswith('--'):
+            name, separator, value = arg.partition('=')
+
+            if name not in OPTIONS or not separator or not value.isdigit():
+                return None, None
+
+            options[name] = int(value)
+
+        else:
+            positionals.append(arg)
+
+    return options, positionals
+
+
+def doBench() -> None:
+    options, fileSets = parseOptions(sys.argv[1:])
+
+    if options is None:
+        return usage()
+
+    rows = options.get('--rows', DEFAULT_ROWS)
+    seed = options.get('--seed', DEFAULT_SEED)
+    repeat = max(1, options.get('--repeat', DEFAULT_REPEAT))
+
+    with open(BENCH_THRESHOLDS_FILE) as thresholdsFile:
+        thresholds = json.load(thresholdsFile)
+
+    logging.disable(logging.CRITICAL)
+    succeeded = True
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            cases = generatedCases(directory, rows, seed)
+
+            for index, fileSet in enumerate(fileSets):
+                recorded = recordedCases(directory, index, fileSet)
+
+                if recorded is None:
+                    succeeded = False
+
+                else:
+                    cases += recorded
+
+            for case in cases:
+                succeeded = runCase(case, thresholds, repeat) and succeeded
+
+    except FileNotFoundError as err:
+        print(f'Cannot open "{err.filename}": file not found.', file=sys.stderr)
+        succeeded = False
+
+    finally:
+        logging.disable(logging.NOTSET)
+
+    if not succeeded:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    doBench()
@@ -5,6 +5,9 @@ Koinly Check: checks the balance change in a Koinly file.
 
 Usage: koinly_check.py path/to/file.csv
 
+When koinly_convert.py wrote a columnar sidecar (--columnar) that is not older than the CSV file, balances are computed from this sidecar,
+memory-mapped in place, instead of parsing the CSV file.
+
 Disclaimer: I built this tool for my own use, and I apologize as it looks a bit quick'n'dirty. 
             I am sharing it because if it was useful to me, it might be useful to others. However, it comes with no guarantee of any kind.
 
@@ -15,6 +18,10 @@ Author: Vincent Poulain, 2022-2025
 import csv
 import sys
 
+from typing import TextIO
+
+from koinly_columnar import NO_INDEX, ColumnarTable, decodeAmount, isFreshSidecar, sidecarPath
+
 
 def usage() -> None:
     print(f'Usage: {sys.argv[0]} path/to/koinly_file.csv', file=sys.stderr)
@@ -54,33 +61,83 @@ def balanceDecrease(balanceChanges: dict, amount: str, currency: str) -> None:
         balanceChanges[currency] -= float(amount)
 
 
+def balanceChangesFromCsv(inputFile: TextIO) -> dict:
+    balanceChanges = {}
+    reader = csvReader(inputFile, ';')
+
+    for row in reader:
+        sentAmount = row[1]
+        sentCurrency = row[2]
+        receivedAmount = row[3]
+        receivedCurrency = row[4]
+        feesAmount = row[5]
+        feesCurrency = row[6]
+
+        initBalanceChangeForCurrency(balanceChanges, sentCurrency)
+        initBalanceChangeForCurrency(balanceChanges, receivedCurrency)
+        initBalanceChangeForCurrency(balanceChanges, feesCurrency)
+
+        balanceDecrease(balanceChanges, sentAmount, sentCurrency)
+        balanceIncrease(balanceChanges, receivedAmount, receivedCurrency)
+        balanceDecrease(balanceChanges, feesAmount, feesCurrency)
+
+    return balanceChanges
+
+
+def balanceChangesFromColumnar(table: ColumnarTable) -> dict:
+    balanceChanges = {}
+    currencies = table.currencies
+    columns = table.columns
+
+    rows = zip(
+        columns['sentCurrency'], columns['receivedCurrency'], columns['feeCurrency'],
+        columns['sentHigh'], columns['sentLow'], columns['sentExponent'],
+        columns['receivedHigh'], columns['receivedLow'], columns['receivedExponent'],
+        columns['feeHigh'], columns['feeLow'], columns['feeExponent']
+    )
+
+    for sentIndex, receivedIndex, feesIndex, sentHigh, sentLow, sentExponent, receivedHigh, receivedLow, receivedExponent, feesHigh, feesLow, feesExponent in rows:
+        sentCurrency = currencies[sentIndex] if sentIndex != NO_INDEX else None
+        receivedCurrency = currencies[receivedIndex] if receivedIndex != NO_INDEX else None
+        feesCurrency = currencies[feesIndex] if feesIndex != NO_INDEX else None
+
+        initBalanceChangeForCurrency(balanceChanges, sentCurrency)
+        initBalanceChangeForCurrency(balanceChanges, receivedCurrency)
+        initBalanceChangeForCurrency(balanceChanges, feesCurrency)
+
+        if sentCurrency and (sentHigh or sentLow):
+            balanceChanges[sentCurrency] -= decodeAmount(sentHigh, sentLow, sentExponent)
+
+        if receivedCurrency and (receivedHigh or receivedLow):
+            balanceChanges[receivedCurrency] += decodeAmount(receivedHigh, receivedLow, receivedExponent)
+
+        if feesCurrency and (feesHigh or feesLow):
+            balanceChanges[feesCurrency] -= decodeAmount(feesHigh, feesLow, feesExponent)
+
+    return balanceChanges
+
+
+def loadBalanceChanges(filePath: str) -> dict:
+    if isFreshSidecar(filePath):
+        try:
+            with ColumnarTable(sidecarPath(filePath)) as table:
+                return balanceChangesFromColumnar(table)
+
+        except ValueError as err:
+            print(f'Ignored columnar sidecar: {err}', file=sys.stderr)
+
+    with open(filePath, newline = '', encoding = 'utf-8') as inputFile:
+        return balanceChangesFromCsv(inputFile)
+
+
 def checkBalanceChanges() -> None:
     if len(sys.argv) != 2:
         return usage()
     
     filePath = sys.argv[1]
 
-    balanceChanges = {}
-
     try:
-        with open(filePath, newline = '') as inputFile:
-            reader = csvReader(inputFile, ';')
-
-            for row in reader:
-                sentAmount = row[1]
-                sentCurrency = row[2]
-                receivedAmount = row[3]
-                receivedCurrency = row[4]
-                feesAmount = row[5]
-                feesCurrency = row[6]
-
-                initBalanceChangeForCurrency(balanceChanges, sentCurrency)
-                initBalanceChangeForCurrency(balanceChanges, receivedCurrency)
-                initBalanceChangeForCurrency(balanceChanges, feesCurrency)
-
-                balanceDecrease(balanceChanges, sentAmount, sentCurrency)
-                balanceIncrease(balanceChanges, receivedAmount, receivedCurrency)
-                balanceDecrease(balanceChanges, feesAmount, feesCurrency)
+        balanceChanges = loadBalanceChanges(filePath)
 
         for currency, change in balanceChanges.items():
             print(f'{currency}: {"+" if change > 0 else ""}{formatAmount(change)}')
@@ -0,0 +1,227 @@
+'''
+Koinly Columnar: compact columnar binary sidecar of a Koinly import file, written by koinly_convert.py and read by koinly_check.py.
+
+Currencies and labels are dictionary-encoded into int32 arrays (-1 stands for none). Amounts are decimal floating-point
+numbers: a coefficient of up to COEFFICIENT_DIGITS significant digits, split into an int64 array of its high digits and an int64 array of its
+AMOUNT_DIGITS low digits, and an int16 array of decimal exponents. Any float repr and any usual converter output is stored exactly; longer
+amounts are stored as the repr of their float value. Either way, each amount decodes to exactly float() of its CSV cell, and amounts beyond
+the float range are rejected with a ValueError. All arrays are little-endian and aligned, so that they can be read in place from a memory-mapped file.
+
+Layout: header (magic, rows count, currencies table size, labels table size), currencies table, labels table (NUL terminated UTF-8 strings),
+padding, then the int64 columns of AMOUNT_COLUMNS, the int32 columns of INDEX_COLUMNS and the int16 columns of EXPONENT_COLUMNS.
+
+Licence: EUPL 1.2 https://joinup.ec.europa.eu/sites/default/files/custom-page/attachment/2020-03/EUPL-1.2%20EN.txt
+Author: Vincent Poulain, 2022-2025
+'''
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+from decimal import Decimal, InvalidOperation
+
+
+SIDECAR_EXTENSION = '.kcol'
+
+MAGIC = b'KCOL0002'
+HEADER = struct.Struct('<8sQQQ')
+
+AMOUNT_DIGITS = 18
+AMOUNT_SCALE = 10 ** AMOUNT_DIGITS
+COEFFICIENT_DIGITS = 2 * AMOUNT_DIGITS
+COEFFICIENT_LIMIT = 10 ** COEFFICIENT_DIGITS
+MAX_EXPONENT = 400
+MAX_FLOAT_EXPONENT = 308
+
+POWERS_OF_TEN = tuple(10 ** exponent for exponent in range(MAX_EXPONENT + 1))
+
+AMOUNT_COLUMNS = ('sentHigh', 'sentLow', 'receivedHigh', 'receivedLow', 'feeHigh', 'feeLow')
+INDEX_COLUMNS = ('sentCurrency', 'receivedCurrency', 'feeCurrency', 'label')
+EXPONENT_COLUMNS = ('sentExponent', 'receivedExponent', 'feeExponent')
+
+COLUMN_TYPES = ((AMOUNT_COLUMNS, 'q', 8), (INDEX_COLUMNS, 'i', 4), (EXPONENT_COLUMNS, 'h', 2))
+
+NO_INDEX = -1
+
+
+def sidecarPath(csvPath: str) -> str:
+    return f'{os.path.splitext(csvPath)[0]}{SIDECAR_EXTENSION}'
+
+
+def isFreshSidecar(csvPath: str) -> bool:
+    path = sidecarPath(csvPath)
+
+    return os.path.isfile(path) and os.path.getmtime(path) >= os.path.getmtime(csvPath)
+
+
+def encodeAmount(amount: str | int | float) -> tuple[int, int, int]:
+    if amount is None or amount == '':
+        return 0, 0, 0
+
+    try:
+        decimal = Decimal(str(amount))
+
+    except InvalidOperation:
+        raise ValueError(f'{amount} is not a decimal number.')
+
+    if not decimal.is_finite():
+        raise ValueError(f'{amount} is not a finite number.')
+
+    sign, digits, exponent = decimal.as_tuple()
+    coefficient = int(''.join(map(str, digits)))
+
+    if coefficient == 0:
+        return 0, 0, 0
+
+    while coefficient % 10 == 0:
+        coefficient //= 10
+        exponent += 1
+
+    if coefficient >= COEFFICIENT_LIMIT or exponent < -MAX_EXPONENT:
+        shortest = float(decimal)
+
+        if shortest in (float('inf'), float('-inf')):
+            raise ValueError(f'{amount} is out of the float range.')
+
+        return encodeAmount(repr(shortest))
+
+    high, low = divmod(-coefficient if sign else coefficient, AMOUNT_SCALE)
+
+    if exponent + len(str(coefficient)) > MAX_FLOAT_EXPONENT:
+        try:
+            decodeAmount(high, low, exponent)
+
+        except OverflowError:
+            raise ValueError(f'{amount} is out of the float range.')
+
+    return high, low, exponent
+
+
+def decodeAmount(high: int, low: int, exponent: int) -> float:
+    coefficient = high * AMOUNT_SCALE + low
+
+    if exponent >= 0:
+        return float(coefficient * POWERS_OF_TEN[exponent])
+
+    return coefficient / POWERS_OF_TEN[-exponent]
+
+
+def _padding(size: int) -> bytes:
+    return b'\0' * (-size % 8)
+
+
+class ColumnarWriter:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.rows = 0
+        self.columns = {name: array(typecode) for names, typecode, _ in COLUMN_TYPES for name in names}
+
+        self._currencies = {}
+        self._labels = {}
+
+
+    @staticmethod
+    def _encode(dictionary: dict[str, int], value: str) -> int:
+        if value is None:
+            return NO_INDEX
+
+        return dictionary.setdefault(value, len(dictionary))
+
+
+    def _appendAmount(self, prefix: str, amount: str, currency: str) -> None:
+        high, low, exponent = encodeAmount(amount) if currency else (0, 0, 0)
+
+        self.columns[f'{prefix}High'].append(high)
+        self.columns[f'{prefix}Low'].append(low)
+        self.columns[f'{prefix}Exponent'].append(exponent)
+        self.columns[f'{prefix}Currency'].append(self._encode(self._currencies, currency or None))
+
+
+    def append(self, line) -> None:
+        self._appendAmount('sent', line.sentAmount, line.sentCurrency)
+        self._appendAmount('received', line.receivedAmount, line.receivedCurrency)
+        self._appendAmount('fee', line.feeAmount, line.feeCurrency)
+        self.columns['label'].append(self._encode(self._labels, line.label or ''))
+        self.rows += 1
+
+
+    def close(self) -> None:
+        currencies = ''.join(f'{currency}\0' for currency in self._currencies).encode()
+        labels = ''.join(f'{label}\0' for label in self._labels).encode()
+
+        with open(self.path, mode = 'wb') as outputFile:
+            outputFile.write(HEADER.pack(MAGIC, self.rows, len(currencies), len(labels)))
+            outputFile.write(currencies)
+            outputFile.write(labels)
+            outputFile.write(_padding(HEADER.size + len(currencies) + len(labels)))
+
+            for name in AMOUNT_COLUMNS + INDEX_COLUMNS + EXPONENT_COLUMNS:
+                column = self.columns[name]
+
+                if sys.byteorder != 'little':
+                    column = array(column.typecode, column)
+                    column.byteswap()
+
+                column.tofile(outputFile)
+
+
+class ColumnarTable:
+    def __init__(self, path: str) -> None:
+        if sys.byteorder != 'little':
+            raise ValueError(f'{path} cannot be mapped in place on a big-endian platform.')
+
+        with open(path, mode = 'rb') as inputFile:
+            self._mmap = mmap.mmap(inputFile.fileno(), 0, access = mmap.ACCESS_READ)
+
+        self._view = memoryview(self._mmap)
+        self.columns = {}
+
+        try:
+            magic, self.rows, currenciesSize, labelsSize = HEADER.unpack_from(self._view)
+
+            if magic != MAGIC:
+                raise ValueError(f'{path} is not a Koinly columnar file.')
+
+            offset = HEADER.size
+            self.currencies = self._strings(offset, currenciesSize)
+            offset += currenciesSize
+            self.labels = self._strings(offset, labelsSize)
+            offset += labelsSize
+            offset += len(_padding(offset))
+
+            if offset + self.rows * sum(itemSize * len(names) for names, _, itemSize in COLUMN_TYPES) > len(self._view):
+                raise ValueError(f'{path} is truncated.')
+
+            for names, typecode, itemSize in COLUMN_TYPES:
+                for name in names:
+                    self.columns[name] = self._view[offset:offset + self.rows * itemSize].cast(typecode)
+                    offset += self.rows * itemSize
+
+        except (ValueError, struct.error):
+            self.close()
+            raise
+
+
+    def _strings(self, offset: int, size: int) -> list[str]:
+        return bytes(self._view[offset:offset + size]).decode().split('\0')[:-1]
+
+
+    def __enter__(self) -> ColumnarTable:
+        return self
+
+
+    def __exit__(self, *excInfo) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        for column in self.columns.values():
+            column.release()
+
+        self.columns = {}
+        self._view.release()
+        self._mmap.close()
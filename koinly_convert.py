@@ -3,12 +3,19 @@
 '''
 Koinly Convert: converts history files from various CEX and block explorers (to date: Meria, Etherlink) to Koinly import files.
 
-Usage: koinly_convert.py meria|etherlink_xtz|etherlink_tokens path/to/file.csv
+Usage: koinly_convert.py [--max-rows=N] [--max-bytes=N] [--columnar] [meria|etherlink] path/to/file.csv [path/to/etherlink_tokens_transfer_file.csv (Etherlink only)]
+
+The mode can be omitted: it is then detected from the first line (delimiter and header) of the input files.
+Converters are plugins of the 'koinly_converters' package, registered in CONVERTERS below and only imported when selected.
+With --max-rows and/or --max-bytes, the output is split into numbered shards listed in a manifest file. Shards only rotate between rows having
+different dates and TxHash, so that the rows of a same TxHash, which share its date, are never split even when interleaved with other transactions.
+Output files left by a previous run of the same input are removed before writing, and no manifest is written when the conversion fails.
+With --columnar, each output file gets a compact columnar binary sidecar (see koinly_columnar.py) that koinly_check.py reads instead of the CSV file.
 
 Disclaimer: I built this tool for my own use, and I apologize as it looks a bit quick'n'dirty. 
             I am sharing it because if it was useful to me, it might be useful to others. However, it comes with no guarantee of any kind.
 
-Default fiat currency notice: the default fiat currency is EUR. Please adjust the variable 'FIAT_BASE_CURRENCY' below to use it with another base currency. 
+Default fiat currency notice: the default fiat currency is EUR. Please adjust the variable 'FIAT_BASE_CURRENCY' in koinly_converters/common.py to use it with another base currency. 
 
 Licence: EUPL 1.2 https://joinup.ec.europa.eu/sites/default/files/custom-page/attachment/2020-03/EUPL-1.2%20EN.txt
 Author: Vincent Poulain, 2022-2025
@@ -17,658 +24,380 @@ Author: Vincent Poulain, 2022-2025
 from __future__ import annotations
 
 import csv
+import importlib
+import io
 import logging
 import os
+import re
 import sys
 
-from typing import TextIO
+from contextlib import ExitStack
+from types import ModuleType
+from typing import Iterable, Iterator, TextIO
 
+from koinly_columnar import SIDECAR_EXTENSION, ColumnarWriter, sidecarPath
+from koinly_converters.common import ConverterError, OutputLine
 
-FIAT_BASE_CURRENCY = 'EUR'
 
 CSV_DELIMITER_OUT = ';'
 CSV_DELIMITER_IN_BINANCECARD = ';'
+CSV_DELIMITERS_IN = (';', ',')
+
+UTF8_BOM = '\ufeff'
 
 MODE_MERIA = 'meria'
 MODE_ETHERLINK = 'etherlink'
 
+OPTION_MAX_ROWS = '--max-rows'
+OPTION_MAX_BYTES = '--max-bytes'
+OPTION_COLUMNAR = '--columnar'
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
-class OutputLine:
-    def __init__(
-            self, 
-            txDate: str, 
-            sentAmount: str, sentCurrency: str, 
-            receivedAmount: str, receivedCurrency: str, *, 
-            feeAmount: str = None, feeCurrency: str = None, 
-            netWorthAmount: str = None, netWorthCurrency: str = None, 
-            label: str = None, description: str = None, txHash: str = None
-        ) -> None:
-        self.txDate = txDate
-        self.sentAmount = sentAmount
-        self.sentCurrency = sentCurrency
-        self.receivedAmount = receivedAmount
-        self.receivedCurrency = receivedCurrency
-        self.feeAmount = feeAmount
-        self.feeCurrency = feeCurrency
-        self.netWorthAmount = netWorthAmount
-        self.netWorthCurrency = netWorthCurrency
-        self.label = label
-        self.description = description
-        self.txHash = txHash
-
-
-    def toList(self) -> list[str]:
-        return [
-            self.txDate, 
-            self.sentAmount, self.sentCurrency, 
-            self.receivedAmount, self.receivedCurrency,
-            self.feeAmount, self.feeCurrency,
-            self.netWorthAmount, self.netWorthCurrency,
-            self.label,
-            self.description,
-            self.txHash
-        ]
-    
+def normalizeHeader(header: str) -> str:
+    return ''.join(header.split()).replace('_', '').lower()
 
-    def __repr__(self) -> str:
-        return repr(self.toList())
-    
-    
-    def __str__(self) -> str:
-        return f"""{{
-    txDate: {self.txDate},
-    sentAmount: {self.sentAmount}, sentCurrency: {self.sentCurrency},
-    receivedAmount: {self.receivedAmount}, receivedCurrency: {self.receivedCurrency},
-    feeAmount: {self.feeAmount}, feeCurrency: {self.feeCurrency},
-    netWorthAmount: {self.netWorthAmount}, netWorthCurrency: {self.netWorthCurrency},
-    label: {self.label},
-    description: {self.description},
-    txHash: {self.txHash}
-}}"""
-    
 
-    @staticmethod
-    def headers() -> OutputLine:
-        return OutputLine(
-            txDate = 'Date', 
-            sentAmount = 'Sent Amount', sentCurrency = 'Sent Currency', 
-            receivedAmount = 'Received Amount', receivedCurrency = 'Received Currency', 
-            feeAmount = 'Fee Amount', feeCurrency = 'Fee Currency', 
-            netWorthAmount = 'Net Worth Amount', netWorthCurrency = 'Net Worth Currency',
-            label = 'Label', 
-            description = 'Description', 
-            txHash = 'TxHash'
+class InputSignature:
+    def __init__(self, name: str, delimiter: str, minColumns: int, headers: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.delimiter = delimiter
+        self.minColumns = minColumns
+        self.headers = frozenset(normalizeHeader(header) for header in headers)
+
+
+    def matches(self, delimiter: str, header: list[str]) -> bool:
+        return (
+            delimiter == self.delimiter and 
+            len(header) >= self.minColumns and 
+            self.headers.issubset(normalizeHeader(column) for column in header)
         )
 
 
-def usage() -> None:
-    logger.error(f'Usage: {sys.argv[0]} {MODE_MERIA}|{MODE_ETHERLINK} path/to/transaction_file.csv [path/to/etherlink_tokens_transfer_file.csv]')
+class ConverterPlugin:
+    def __init__(self, mode: str, module: str, inputs: tuple[InputSignature, ...]) -> None:
+        self.mode = mode
+        self.module = module
+        self.inputs = inputs
+        self._loaded = None
 
 
-def doConvert() -> None:
-    if len(sys.argv) in (3, 4):
-        mode = sys.argv[1]
+    def load(self) -> ModuleType:
+        if self._loaded is None:
+            self._loaded = importlib.import_module(self.module)
 
-        if (len(sys.argv) == 4 and mode == MODE_MERIA) or (len(sys.argv) == 3 and mode == MODE_ETHERLINK):
-            return usage()
-    else:
-        return usage()
-    
-    filePathA = sys.argv[2]
-    filePathB = None if mode != MODE_ETHERLINK else sys.argv[3]
+        return self._loaded
 
-    lines = None
 
-    try:
-        with open(filePathA, newline = '') as inputFileA:
-            if mode == MODE_MERIA:
-                lines = convertMeria(inputFileA)
+    def convert(self, *inputFiles: TextIO) -> list[OutputLine]:
+        return self.load().convert(*inputFiles)
 
-            elif mode == MODE_ETHERLINK:
-                with open(filePathB, newline = '') as inputFileB:
-                    lines = consolidateEtherlink(sorted(convertEtherlinkXtz(inputFileA) + convertEtherlinkTokens(inputFileB), key = lambda x: x.txDate))            
 
-            else:
-                logger.error(f'Unknown mode: {mode}. Try "{sys.argv[0]} help" for help.')
+CONVERTERS = {
+    plugin.mode: plugin for plugin in (
+        ConverterPlugin(MODE_MERIA, 'koinly_converters.meria', (
+            InputSignature('meria', ';', 12, ('sourceAmount', 'sourceCurrency', 'destinationAmount', 'destinationCurrency', 'destinationType')),
+        )),
+        ConverterPlugin(MODE_ETHERLINK, 'koinly_converters.etherlink', (
+            InputSignature('etherlink_xtz', ',', 15, ('TxHash', 'Value', 'Fee', 'MethodName')),
+            InputSignature('etherlink_tokens', ',', 12, ('TxHash', 'TokenDecimals', 'TokenSymbol')),
+        )),
+    )
+}
 
-        splittedPath = os.path.split(filePathA)
 
-        with open(os.path.join(splittedPath[0], f'koinly_{splittedPath[1]}'), mode = 'w', newline = '') as outputFile:
-            writer = csv.writer(outputFile, delimiter = CSV_DELIMITER_OUT, quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            writer.writerow(OutputLine.headers().toList())
+class ShardedCsvWriter:
+    def __init__(self, outputPath: str, *, maxRows: int = None, maxBytes: int = None, columnar: bool = False) -> None:
+        self.outputPath = outputPath
+        self.maxRows = maxRows
+        self.maxBytes = maxBytes
+        self.columnar = columnar
+        self.sharded = maxRows is not None or maxBytes is not None
+        self.shards = []
 
-            for row in lines:
-                writer.writerow(row.toList())
+        self._file = None
+        self._columnarWriter = None
+        self._rows = 0
+        self._bytes = 0
+        self._firstDate = None
+        self._lastDate = None
+        self._buffer = io.StringIO()
+        self._formatter = csv.writer(self._buffer, delimiter = CSV_DELIMITER_OUT, quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        self._header = self._format([OutputLine.headers()])
 
-    except FileNotFoundError as err:
-        logger.error(f'Cannot open "{err.filename}": file not found.')
+
+    def __enter__(self) -> ShardedCsvWriter:
+        return self
 
 
-def csvReader(inputFile: str, delimiter: str) -> csv.reader:
-    reader = csv.reader(inputFile, delimiter = delimiter)
-    next(reader)
+    def __exit__(self, excType, *excInfo) -> None:
+        self.close(failed = excType is not None)
 
-    return reader
 
+    def _format(self, lines: list[OutputLine]) -> str:
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._formatter.writerows(line.toList() for line in lines)
 
-def toUnits(amount: str, decimals: str) -> str:
-    intDecimals = int(decimals)
-    floatResult = int(amount) / int(f'1{intDecimals * "0"}')
+        return self._buffer.getvalue()
 
-    strResult = f'{floatResult:.{intDecimals}f}'
 
-    while (strResult[-1] == '0'):
-        strResult = strResult[:-1]
-  
-    if strResult[-1] == '.':
-        strResult = strResult[:-1]
+    def _shardPath(self, index: int) -> str:
+        if not self.sharded:
+            return self.outputPath
         
-    return strResult
+        root, ext = os.path.splitext(self.outputPath)
 
+        return f'{root}_{index:03d}{ext}'
 
-def receivedFairAmount(receivedAmount: str, sentAmount: str):
-    return float(receivedAmount) >= float(sentAmount)
-    
 
-def convertMeria(inputFile: TextIO) -> list[OutputLine]:
-    def unhandledTxInfoForTxTypeError(txType: str, txInfo: str):
-        logger.error(f'Unhandled txInfo for txType {txType}: {txInfo}.')
-
-    normalizeLunaTicker = lambda ticker : ticker if ticker != 'LUNA' else f'{ticker}2'
-
-    reader = csvReader(inputFile, ';')
-    lines = []
-
-    for row in reader:
-        txHash = row[0] if row[0] != 'n/a' else None
-        txType = row[1]
-        sourceAmount = row[2]
-        sourceCurrency = row[3]
-        destinationAmount = row[4]
-        destinationCurrency = row[5]
-        address = row[6]
-        memo = row[7]
-        destinationType = row[8]
-        feeMultiplier = float(row[9]) / 100.0
-        txInfo = row[10]
-        txDate = row[11]
-
-        sentAmount = None
-        sentCurrency = None
-        receivedAmount = None
-        receivedCurrency = None
-        feeAmount = None
-        feeCurrency = None
-        label = None
-        description = None
-
-        if txType == 'credit':
-            if txInfo in ('airdrop', 'deposit', 'order', 'reward', 'unstaking', 'resale'):
-                receivedAmount = destinationAmount
-                receivedCurrency = destinationCurrency
-
-                if feeMultiplier > 0:
-                    feeAmount = str(feeMultiplier * float(receivedAmount))
-                    feeCurrency = receivedCurrency
-
-                label = (
-                    'unstake' if txInfo in ('unstaking', 'resale') else 
-                        'liquidity in' if receivedCurrency == FIAT_BASE_CURRENCY else 
-                            txInfo
-                )
-
-            elif txInfo in ('claim'):
-                pass
-
-            else:
-                unhandledTxInfoForTxTypeError(txType, txInfo)
-
-        elif txType == 'debit':
-            if txInfo in ('masternode', 'order', 'reinvestment', 'staking'):
-                sentAmount = sourceAmount
-                sentCurrency = sourceCurrency
-
-                if feeMultiplier > 0:
-                    feeAmount = str(feeMultiplier * float(sentAmount))
-                    feeCurrency = sentCurrency
-
-                label = (
-                    'stake' if txInfo in ('masternode', 'reinvestment', 'staking') else 
-                        'cost' if txInfo in ('order') else 
-                            None
-                )             
-
-            else:
-                unhandledTxInfoForTxTypeError(txType, txInfo)
-
-        elif txType == 'exchange':
-            if sourceCurrency == destinationCurrency:
-                continue
-            
-            if txInfo == '':
-                sentAmount = sourceAmount
-                sentCurrency = sourceCurrency
+    def _manifestPath(self) -> str:
+        return f'{os.path.splitext(self.outputPath)[0]}_manifest.csv'
 
-                receivedAmount = destinationAmount
-                receivedCurrency = destinationCurrency
 
-                if feeMultiplier > 0:
-                    feeAmount = str(feeMultiplier * float(sentAmount))
-                    feeCurrency = sentCurrency
+    def _removeStaleOutputs(self) -> None:
+        directory, name = os.path.split(self.outputPath)
+        root, ext = os.path.splitext(name)
+        stalePattern = re.compile(rf'{re.escape(root)}(_\d{{3,}})?({re.escape(ext)}|{re.escape(SIDECAR_EXTENSION)})')
+        stalePaths = sorted(
+            os.path.join(directory, fileName) for fileName in os.listdir(directory or '.') 
+                if stalePattern.fullmatch(fileName) or fileName == os.path.basename(self._manifestPath())
+        )
 
-                label = ''
+        for stalePath in stalePaths:
+            os.remove(stalePath)
 
-            else:
-                unhandledTxInfoForTxTypeError(txType, txInfo)
+        if len(stalePaths) > 0:
+            logger.info(f'Removed {len(stalePaths)} output file(s) of a previous run: {", ".join(stalePaths)}.')
 
-        elif txType == 'withdraw':
-            if txInfo == '':
-                sentAmount = sourceAmount
-                sentCurrency = sourceCurrency
 
-                if feeMultiplier > 0:
-                    feeAmount = str(feeMultiplier * float(sentAmount))
-                    feeCurrency = sentCurrency
+    def _openShard(self) -> None:
+        if len(self.shards) == 0:
+            self._removeStaleOutputs()
 
-                description = f'{destinationType} {address} {memo}'
-                label = ''
+        self._file = open(self._shardPath(len(self.shards) + 1), mode = 'w', newline = '', encoding = 'utf-8')
+        self._file.write(self._header)
+        self._columnarWriter = ColumnarWriter(sidecarPath(self._file.name)) if self.columnar else None
+        self._rows = 0
+        self._bytes = len(self._header.encode())
+        self._firstDate = None
+        self._lastDate = None
 
-            else:
-                unhandledTxInfoForTxTypeError(txType, txInfo)
 
-        else:
-            logger.error(f'Unhandled txType: {txType}.')
-
-        if label is not None:
-            lines.append(
-                OutputLine(
-                    txDate = txDate,
-                    sentAmount = sentAmount, sentCurrency = normalizeLunaTicker(sentCurrency),
-                    receivedAmount = receivedAmount, receivedCurrency = normalizeLunaTicker(receivedCurrency),
-                    feeAmount = feeAmount, feeCurrency = normalizeLunaTicker(feeCurrency),
-                    label = label,
-                    description = description,
-                    txHash = txHash
-                )
-            )
-
-    return lines
-
-
-def convertEtherlinkXtz(inputFile: TextIO) -> list[OutputLine]:
-    reader = csvReader(inputFile, ',')
-    lines = []
-
-    def toXtz(amount: str) -> str:
-        return toUnits(amount, 18)
-
-    for row in reader:
-        txHash = row[0]
-        txDate = row[2]
-        fromAddress = row[3]
-        toAddress = row[4]        
-        txType = row[6]
-        amount = row[7]
-        fees = row[8]
-        status = row[9]
-        methodName = row[14]
-        currency = 'XTZ'
-
-        if status != 'ok':
-            logger.warning(f'Ignored transaction with status "{status}": {row}')
-            continue
+    def _closeShard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self.shards.append((os.path.basename(self._file.name), self._rows, self._bytes, self._firstDate, self._lastDate))
+            self._file = None
 
-        sentAmount = None
-        sentCurrency = None
-        receivedAmount = None
-        receivedCurrency = None
-        feeAmount = None
-        feeCurrency = None
-        label = None
-        description = None        
-
-        if txType == 'IN':
-            receivedAmount = toXtz(amount)
-            receivedCurrency = currency
-            label = methodName if methodName == 'deposit' else None
-
-        elif txType == 'OUT':
-            sentAmount = toXtz(amount)
-            sentCurrency = currency
-            feeAmount = toXtz(fees)
-            feeCurrency = currency           
-            label = None
+        if self._columnarWriter is not None:
+            self._columnarWriter.close()
+            self._columnarWriter = None
 
-        else:
-            logger.error(f'Unhandled txType: {txType}.')
-
-        description = f'{txType}{(" (" + methodName + ")") if len(methodName) > 0 else ""}: {fromAddress} to {toAddress}' 
-
-        lines.append(
-            OutputLine(
-                txDate = txDate,
-                sentAmount = sentAmount, sentCurrency = sentCurrency,
-                receivedAmount = receivedAmount, receivedCurrency = receivedCurrency,
-                feeAmount = feeAmount, feeCurrency = feeCurrency,
-                label = label,
-                description = description,
-                txHash = txHash
-            )
+
+    def _exceeds(self, rows: int, bytes: int) -> bool:
+        return (
+            (self.maxRows is not None and rows > self.maxRows) or 
+            (self.maxBytes is not None and bytes > self.maxBytes)
         )
 
-    return lines
 
+    def writeGroup(self, group: list[OutputLine]) -> None:
+        text = self._format(group)
+        size = len(text.encode())
+
+        if self._file is not None and self._rows > 0 and self._exceeds(self._rows + len(group), self._bytes + size):
+            self._closeShard()
+
+        if self._file is None:
+            self._openShard()
+
+            if self._exceeds(len(group), self._bytes + size):
+                logger.warning(f'Transactions of {group[0].txDate} ({len(group)} rows) exceed the shard limits on their own: written to a dedicated shard.')
+
+        self._file.write(text)
+        self._appendColumnar(group)
+        self._rows += len(group)
+        self._bytes += size
+        self._firstDate = self._firstDate or group[0].txDate
+        self._lastDate = group[-1].txDate
+
+
+    def _appendColumnar(self, group: list[OutputLine]) -> None:
+        if self._columnarWriter is None:
+            return
+
+        try:
+            for line in group:
+                self._columnarWriter.append(line)
+
+        except ValueError as err:
+            logger.error(f'Cannot store the transactions of {group[0].txDate} in the columnar sidecar, no sidecar written for {self._file.name}: {err}')
+            self._columnarWriter = None
+
+
+    def write(self, lines: Iterable[OutputLine]) -> None:
+        for group in groupTransactions(lines):
+            self.writeGroup(group)
+
+
+    def close(self, failed: bool = False) -> None:
+        if self._file is None and len(self.shards) == 0 and not failed:
+            self._openShard()
+
+        self._closeShard()
+
+        if failed:
+            logger.error(f'Conversion failed: {self.outputPath} is incomplete{"" if not self.sharded else ", no manifest written"}.')
+
+        elif self.sharded:
+            with open(self._manifestPath(), mode = 'w', newline = '', encoding = 'utf-8') as manifestFile:
+                writer = csv.writer(manifestFile, delimiter = CSV_DELIMITER_OUT, quotechar='"', quoting=csv.QUOTE_MINIMAL)
+                writer.writerow(['File', 'Rows', 'Bytes', 'First Date', 'Last Date'])
+                writer.writerows(self.shards)
+
+
+def groupTransactions(lines: Iterable[OutputLine]) -> Iterator[list[OutputLine]]:
+    group = []
+
+    for line in lines:
+        if len(group) > 0 and line.txDate != group[-1].txDate and (line.txHash is None or line.txHash != group[-1].txHash):
+            yield group
+            group = []
+
+        group.append(line)
+
+    if len(group) > 0:
+        yield group
+
+
+def usage() -> None:
+    logger.error(f'Usage: {sys.argv[0]} [{OPTION_MAX_ROWS}=N] [{OPTION_MAX_BYTES}=N] [{OPTION_COLUMNAR}] [{"|".join(CONVERTERS)}] path/to/transaction_file.csv [path/to/etherlink_tokens_transfer_file.csv]')
+
+
+def parseOptions(args: list[str]) -> tuple[dict[str, str], list[str]] | tuple[None, None]:
+    options = {}
+    positionals = []
+
+    for arg in args:
+        if arg.startswith('--'):
+            name, separator, value = arg.partition('=')
+
+            if (name not in (OPTION_MAX_ROWS, OPTION_MAX_BYTES) or not separator) and (name != OPTION_COLUMNAR or separator):
+                return None, None
+            
+            options[name] = value
+
+        else:
+            positionals.append(arg)
 
-def convertEtherlinkTokens(inputFile: TextIO) -> list[OutputLine]:
-    reader = csvReader(inputFile, ',')
-    lines = []
+    return options, positionals
+
+
+def positiveIntOption(options: dict[str, str], name: str) -> int:
+    if name not in options:
+        return None
+
+    value = int(options[name])
+
+    if value <= 0:
+        raise ValueError(value)
     
-    for row in reader:
-        txHash = row[0]
-        txDate = row[2]
-        fromAddress = row[3]
-        toAddress = row[4]      
-        contractAddress = row[5]  
-        txType = row[6]
-        tokenDecimals = row[7]
-        tokenSymbol = row[8]
-        amount = row[9]
-        status = row[11]
-
-        if status != 'ok':
-            logger.warning(f'Ignored transfer with status "{status}": {row}')
-            continue
+    return value
+
 
-        sentAmount = None
-        sentCurrency = None
-        receivedAmount = None
-        receivedCurrency = None
-        feeAmount = None
-        feeCurrency = None
-        label = None
-        description = None        
+def sniffHeader(inputFile: TextIO) -> tuple[str, list[str]]:
+    firstLine = inputFile.readline().removeprefix(UTF8_BOM)
+    inputFile.seek(0)
 
-        if len(tokenDecimals) == 0:
-            tokenDecimals = 0
+    delimiter = max(CSV_DELIMITERS_IN, key = firstLine.count)
 
-        if txType == 'IN':
-            receivedAmount = toUnits(amount, tokenDecimals)
-            receivedCurrency = tokenSymbol
+    return delimiter, next(csv.reader([firstLine], delimiter = delimiter), [])
 
-        elif txType == 'OUT':
-            sentAmount = toUnits(amount, tokenDecimals)
-            sentCurrency = tokenSymbol
 
-            if sentCurrency[:3]  == 'slW' and  toAddress == '0x65fe928c5D04a2DA42347bA9D4d1C3f4952851F5' and contractAddress == '0x008ae222661B6A42e3A097bd7AAC15412829106b':
-                receivedAmount = sentAmount
-                receivedCurrency = sentCurrency[3:]
-                description = f'Unwrapped {sentAmount} {sentCurrency} to {receivedAmount} {receivedCurrency}'
+def detectConverter(inputFiles: list[TextIO]) -> tuple[ConverterPlugin, list[TextIO]] | tuple[None, None]:
+    sniffed = [sniffHeader(inputFile) for inputFile in inputFiles]
+
+    for plugin in CONVERTERS.values():
+        if len(plugin.inputs) != len(inputFiles):
+            continue
+
+        orderedFiles = []
+        remaining = list(zip(inputFiles, sniffed))
+
+        for signature in plugin.inputs:
+            match = next((candidate for candidate in remaining if signature.matches(*candidate[1])), None)
+
+            if match is None:
+                break
+
+            remaining.remove(match)
+            orderedFiles.append(match[0])
 
         else:
-            logger.error(f'Unhandled txType: {txType}.')
-
-        if label is None:
-            description = f'{txType}: {fromAddress} to {toAddress}' 
-
-        lines.append(
-            OutputLine(
-                txDate = txDate,
-                sentAmount = sentAmount, sentCurrency = sentCurrency,
-                receivedAmount = receivedAmount, receivedCurrency = receivedCurrency,
-                feeAmount = feeAmount, feeCurrency = feeCurrency,
-                label = label,
-                description = description,
-                txHash = txHash
-            )
-        )
+            return plugin, orderedFiles
 
-    return lines
+    return None, None
 
 
-def consolidateEtherlink(txList: list[OutputLine]) -> list[OutputLine]:
-    def getTxByIndex(txList: list[OutputLine], index: int) -> OutputLine:
-        try:
-            return txList[index]
-        
-        except IndexError:
-            return OutputLine(None, None, None, None, None)
-        
+def doConvert() -> None:
+    options, args = parseOptions(sys.argv[1:])
 
-    consolidatedTxs = []
-    skipNext = 0
-
-    for idx in range(len(txList)):
-        tx = txList[idx]
-
-        if skipNext > 0:
-            skipNext -= 1
-
-        elif tx.description.startswith('OUT (depositETH):'):
-            txBack = getTxByIndex(txList, idx + 1)
-
-            if (
-                txBack.txDate != tx.txDate or 
-                txBack.sentAmount is not None or 
-                txBack.sentCurrency is not None or 
-                not receivedFairAmount(txBack.receivedAmount, tx.sentAmount) or 
-                txBack.receivedCurrency != f'slW{tx.sentCurrency}' or
-                txBack.txHash != tx.txHash
-            ):
-                logger.error(f'No consistent back transaction for OUT depositETH: {tx}')
-                consolidatedTxs.append(tx)
-
-            else:
-                consolidatedTxs.append(OutputLine(
-                        txDate = tx.txDate, 
-                        sentAmount = tx.sentAmount, sentCurrency = tx.sentCurrency, 
-                        receivedAmount = txBack.receivedAmount, receivedCurrency = txBack.receivedCurrency,
-                        feeAmount = tx.feeAmount, feeCurrency = tx.feeCurrency, 
-                        netWorthAmount = txBack.receivedAmount, netWorthCurrency = tx.sentCurrency,
-                        label = '', description = f'Deposited {tx.sentAmount} {tx.sentCurrency}',
-                        txHash = tx.txHash
-                    )
-                )
-
-                skipNext = 1
-
-        elif tx.description.startswith('OUT (supply):'):
-            txBackA = getTxByIndex(txList, idx + 1)
-            txBackB = getTxByIndex(txList, idx + 2)
-
-            if (
-                txBackA.txDate != tx.txDate or txBackB.txDate != tx.txDate or
-                txBackA.sentAmount is None or 
-                txBackA.sentCurrency is None or 
-                not receivedFairAmount(txBackB.receivedAmount, txBackA.sentAmount) or 
-                txBackB.receivedCurrency != f'sl{txBackA.sentCurrency}' or
-                txBackA.txHash != tx.txHash or txBackB.txHash != tx.txHash
-            ):
-                logger.error(f'No consistent back transactions for supply: {tx}')
-                consolidatedTxs.append(tx)
-
-            else:
-                tx.description = f'Unlocked {txBackA.sentCurrency} for OUT supply'
-                consolidatedTxs.append(tx)
-
-                consolidatedTxs.append(OutputLine(
-                        txDate = tx.txDate, 
-                        sentAmount = txBackA.sentAmount, sentCurrency = txBackA.sentCurrency, 
-                        receivedAmount = txBackB.receivedAmount, receivedCurrency = txBackB.receivedCurrency,
-                        feeAmount = txBackA.feeAmount, feeCurrency = tx.feeCurrency, 
-                        netWorthAmount = txBackA.receivedAmount, netWorthCurrency = tx.sentCurrency,
-                        label = '', description = f'Supplied {txBackA.sentAmount} {txBackA.sentCurrency}',
-                        txHash = tx.txHash
-                    )
-                )
-
-                skipNext = 2
-
-        elif tx.description.startswith('OUT (withdrawETH):'):
-            txBack = getTxByIndex(txList, idx + 1)
-
-            if (
-                txBack.txDate != tx.txDate or 
-                txBack.sentAmount is not None or 
-                txBack.sentCurrency is not None or 
-                txBack.receivedAmount is None or 
-                txBack.receivedCurrency != f'slW{tx.sentCurrency}' or
-                txBack.txHash != tx.txHash
-            ):
-                logger.error(f'No consistent back transaction for OUT withdrawETH: {tx}')
-                consolidatedTxs.append(tx)
-
-            else:
-                consolidatedTxs.append(OutputLine(
-                        txDate = tx.txDate, 
-                        sentAmount = tx.sentAmount, sentCurrency = tx.sentCurrency, 
-                        receivedAmount = txBack.receivedAmount, receivedCurrency = txBack.receivedCurrency,
-                        feeAmount = tx.feeAmount, feeCurrency = tx.feeCurrency, 
-                        label = None, description = f'Unlocked {tx.sentCurrency} for redeem',
-                        txHash = tx.txHash
-                    )
-                )
-
-                skipNext = 1
-
-        elif tx.description.startswith('OUT (withdraw):'):
-            txBackA = getTxByIndex(txList, idx + 1)
-            txBackB = getTxByIndex(txList, idx + 2)
-
-            if (
-                txBackA.txDate != tx.txDate or txBackB.txDate != tx.txDate or
-                (txBackA.sentAmount is not None and (txBackA.sentCurrency != f'sl{txBackB.receivedCurrency}' or not receivedFairAmount(txBackB.receivedAmount, txBackA.sentAmount))) or
-                (txBackA.sentAmount is None and (txBackA.receivedCurrency != f'sl{txBackB.receivedCurrency}')) or
-                txBackB.receivedCurrency is None or
-                txBackA.txHash != tx.txHash or txBackB.txHash != tx.txHash
-            ):
-                logger.error(f'No consistent back transactions for withdraw: {tx}')
-                consolidatedTxs.append(tx)
-
-            else:
-                if txBackA.sentAmount is None:
-                    tx.description = f'Received {txBackA.receivedCurrency} interests during OUT withdrawal'
-                    tx.sentAmount = 0
-                    tx.receivedAmount = txBackA.receivedAmount
-                    tx.receivedCurrency = txBackA.receivedCurrency    
-
-                else:
-                    tx.description = f'Unlocked {txBackA.sentCurrency} for OUT withdrawal'
-
-                consolidatedTxs.append(tx)         
-
-                consolidatedTxs.append(OutputLine(
-                        txDate = tx.txDate, 
-                        sentAmount = txBackA.sentAmount, sentCurrency = txBackA.sentCurrency, 
-                        receivedAmount = txBackB.receivedAmount, receivedCurrency = txBackB.receivedCurrency,
-                        feeAmount = txBackA.feeAmount, feeCurrency = tx.feeCurrency, 
-                        label = '', description = f'Redeemed {txBackB.receivedAmount} {txBackB.receivedCurrency}',
-                        txHash = tx.txHash
-                    )
-                )
-
-                skipNext = 2
-                
-        elif tx.description.startswith('OUT (multicall):'):
-            txBack = getTxByIndex(txList, idx + 1)
-
-            if (
-                txBack.txDate != tx.txDate or 
-                txBack.sentAmount is not None or 
-                txBack.sentCurrency is not None or 
-                txBack.receivedAmount is None or 
-                txBack.receivedCurrency == tx.receivedCurrency or
-                txBack.txHash != tx.txHash
-            ):
-                logger.error(f'No consistent back transaction for OUT multicall: {tx}')
-                consolidatedTxs.append(tx)
-
-            else:
-                consolidatedTxs.append(OutputLine(
-                        txDate = tx.txDate, 
-                        sentAmount = tx.sentAmount, sentCurrency = tx.sentCurrency, 
-                        receivedAmount = txBack.receivedAmount, receivedCurrency = txBack.receivedCurrency,
-                        feeAmount = tx.feeAmount, feeCurrency = tx.feeCurrency, 
-                        label = '', description = f'Swapped {tx.sentAmount} {tx.sentCurrency} to {txBack.receivedAmount} {txBack.receivedCurrency}',
-                        txHash = tx.txHash
-                    )
-                )
-
-                skipNext = 1
-
-        elif tx.description.startswith('OUT (bridge):'):
-            txBack = getTxByIndex(txList, idx + 1)
-
-            if (
-                txBack.txDate != tx.txDate or
-                tx.sentAmount is None or
-                tx.sentCurrency != 'XTZ' or
-                txBack.sentAmount is None or
-                txBack.sentCurrency is None or
-                txBack.txHash != tx.txHash
-            ):
-                logger.error(f'No consistent back transaction for OUT bridge: {tx}')
-                consolidatedTxs.append(tx)
-
-            else:
-                consolidatedTxs.append(OutputLine(
-                        txDate = tx.txDate, 
-                        sentAmount = None, sentCurrency = None,
-                        receivedAmount = None, receivedCurrency = None,
-                        feeAmount = tx.sentAmount, feeCurrency = tx.sentCurrency, 
-                        label = None, description = f'Bridge foreign gas fees',
-                        txHash = tx.txHash
-                    )
-                )
-
-                consolidatedTxs.append(OutputLine(
-                        txDate = tx.txDate, 
-                        sentAmount = txBack.sentAmount, sentCurrency = txBack.sentCurrency,
-                        receivedAmount = None, receivedCurrency = None,
-                        label = None, description = f'Bridged out {txBack.sentAmount} {txBack.sentCurrency}',
-                        txHash = tx.txHash
-                    )
-                )
-
-                skipNext = 1
-
-        elif tx.description.startswith('OUT (exactInputSingle):'):
-            txBackA = getTxByIndex(txList, idx + 1)
-            txBackB = getTxByIndex(txList, idx + 2)
-
-            if (
-                txBackA.txDate != tx.txDate or txBackB.txDate != tx.txDate or
-                txBackA.receivedAmount is None or 
-                txBackA.receivedCurrency != 'xU3O8' or 
-                txBackB.sentCurrency is None or
-                txBackB.sentAmount is None or
-                txBackA.txHash != tx.txHash or txBackB.txHash != tx.txHash
-            ):
-                logger.error(f'No consistent back transactions for OUT exactInputSingle: {tx}')
-                consolidatedTxs.append(tx)
-
-            else:
-                tx.description = f'Bought {txBackA.receivedCurrency}'
-                consolidatedTxs.append(OutputLine(
-                        txDate = tx.txDate, 
-                        sentAmount = txBackB.sentAmount, sentCurrency = txBackB.sentCurrency, 
-                        receivedAmount = txBackA.receivedAmount, receivedCurrency = txBackA.receivedCurrency,
-                        feeAmount = tx.feeAmount, feeCurrency = tx.feeCurrency, 
-                        label = '', description = f'Bought {txBackA.receivedAmount} {txBackA.receivedCurrency}',
-                        txHash = tx.txHash
-                    )
-                )
-
-                skipNext = 2
+    if options is None:
+        return usage()
+
+    try:
+        maxRows = positiveIntOption(options, OPTION_MAX_ROWS)
+        maxBytes = positiveIntOption(options, OPTION_MAX_BYTES)
+
+    except ValueError:
+        return usage()
+
+    plugin = CONVERTERS.get(args[0]) if len(args) > 0 else None
+    filePaths = args[1:] if plugin is not None else args
+
+    if plugin is None and len(args) > 1 and not os.path.isfile(args[0]):
+        logger.error(f'Unknown mode: {args[0]} (not an input file either). Valid modes: {", ".join(CONVERTERS)}.')
+        return
+
+    if len(filePaths) not in (1, 2) or (plugin is not None and len(filePaths) != len(plugin.inputs)):
+        return usage()
+
+    lines = None
+
+    try:
+        with ExitStack() as stack:
+            inputFiles = [stack.enter_context(open(filePath, newline = '')) for filePath in filePaths]
+
+            if plugin is None:
+                plugin, inputFiles = detectConverter(inputFiles)
+
+                if plugin is None:
+                    logger.error(f'Cannot detect the format of {", ".join(filePaths)}. Try "{sys.argv[0]} {"|".join(CONVERTERS)} ..." to force it.')
+                    return
                 
-        else:
-            consolidatedTxs.append(tx)
+                logger.info(f'Detected mode: {plugin.mode}.')
+
+            outputPath = inputFiles[0].name
+            lines = plugin.convert(*inputFiles)
+
+        splittedPath = os.path.split(outputPath)
 
-    return consolidatedTxs
+        with ShardedCsvWriter(os.path.join(splittedPath[0], f'koinly_{splittedPath[1]}'), maxRows = maxRows, maxBytes = maxBytes, columnar = OPTION_COLUMNAR in options) as writer:
+            writer.write(lines)
+
+        if writer.sharded:
+            logger.info(f'Wrote {len(writer.shards)} shard(s).')
+
+    except FileNotFoundError as err:
+        logger.error(f'Cannot open "{err.filename}": file not found.')
+
+    except ConverterError as err:
+        logger.error(f'Conversion failed: {err}')
 
 
 if __name__ == '__main__':
+    logging.basicConfig(format = '%(message)s')
     doConvert()
-
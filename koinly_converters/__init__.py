@@ -0,0 +1,3 @@
+'''
+Koinly Convert converter plugins. Each exchange or block explorer lives in its own module, imported by koinly_convert.py only when selected.
+'''
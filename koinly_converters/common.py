@@ -0,0 +1,116 @@
+'''
+Common definitions shared by the Koinly Convert converter plugins: the Koinly output line and the input parsing helpers.
+
+Default fiat currency notice: the default fiat currency is EUR. Please adjust the variable 'FIAT_BASE_CURRENCY' below to use it with another base currency. 
+
+Licence: EUPL 1.2 https://joinup.ec.europa.eu/sites/default/files/custom-page/attachment/2020-03/EUPL-1.2%20EN.txt
+Author: Vincent Poulain, 2022-2025
+'''
+
+from __future__ import annotations
+
+import csv
+import logging
+
+
+FIAT_BASE_CURRENCY = 'EUR'
+
+logger = logging.getLogger()
+
+
+class ConverterError(Exception):
+    pass
+
+
+class OutputLine:
+    def __init__(
+            self, 
+            txDate: str, 
+            sentAmount: str, sentCurrency: str, 
+            receivedAmount: str, receivedCurrency: str, *, 
+            feeAmount: str = None, feeCurrency: str = None, 
+            netWorthAmount: str = None, netWorthCurrency: str = None, 
+            label: str = None, description: str = None, txHash: str = None
+        ) -> None:
+        self.txDate = txDate
+        self.sentAmount = sentAmount
+        self.sentCurrency = sentCurrency
+        self.receivedAmount = receivedAmount
+        self.receivedCurrency = receivedCurrency
+        self.feeAmount = feeAmount
+        self.feeCurrency = feeCurrency
+        self.netWorthAmount = netWorthAmount
+        self.netWorthCurrency = netWorthCurrency
+        self.label = label
+        self.description = description
+        self.txHash = txHash
+
+
+    def toList(self) -> list[str]:
+        return [
+            self.txDate, 
+            self.sentAmount, self.sentCurrency, 
+            self.receivedAmount, self.receivedCurrency,
+            self.feeAmount, self.feeCurrency,
+            self.netWorthAmount, self.netWorthCurrency,
+            self.label,
+            self.description,
+            self.txHash
+        ]
+    
+
+    def __repr__(self) -> str:
+        return repr(self.toList())
+    
+    
+    def __str__(self) -> str:
+        return f"""{{
+    txDate: {self.txDate},
+    sentAmount: {self.sentAmount}, sentCurrency: {self.sentCurrency},
+    receivedAmount: {self.receivedAmount}, receivedCurrency: {self.receivedCurrency},
+    feeAmount: {self.feeAmount}, feeCurrency: {self.feeCurrency},
+    netWorthAmount: {self.netWorthAmount}, netWorthCurrency: {self.netWorthCurrency},
+    label: {self.label},
+    description: {self.description},
+    txHash: {self.txHash}
+}}"""
+    
+
+    @staticmethod
+    def headers() -> OutputLine:
+        return OutputLine(
+            txDate = 'Date', 
+            sentAmount = 'Sent Amount', sentCurrency = 'Sent Currency', 
+            receivedAmount = 'Received Amount', receivedCurrency = 'Received Currency', 
+            feeAmount = 'Fee Amount', feeCurrency = 'Fee Currency', 
+            netWorthAmount = 'Net Worth Amount', netWorthCurrency = 'Net Worth Currency',
+            label = 'Label', 
+            description = 'Description', 
+            txHash = 'TxHash'
+        )
+
+
+def csvReader(inputFile: str, delimiter: str) -> csv.reader:
+    reader = csv.reader(inputFile, delimiter = delimiter)
+    next(reader)
+
+    return reader
+
+
+def toUnits(amount: str, decimals: str) -> str:
+    intDecimals = int(decimals)
+    floatResult = int(amount) / int(f'1{intDecimals * "0"}')
+
+    strResult = f'{floatResult:.{intDecimals}f}'
+
+    while (strResult[-1] == '0'):
+        strResult = strResult[:-1]
+  
+    if strResult[-1] == '.':
+        strResult = strResult[:-1]
+        
+    return strResult
+
+
+def receivedFairAmount(receivedAmount: str, sentAmount: str):
+    return float(receivedAmount) >= float(sentAmount)
@@ -0,0 +1,545 @@
+'''
+Koinly Convert plugin: Etherlink explorer transactions and token transfers files.
+
+Protocol specifics (unwrapping contracts and routers, consolidation of the back transactions of each contract method) are read from
+'etherlink_rules.json' when this module is loaded. Supporting a new protocol reusing an existing consolidation pattern only requires editing this file.
+An invalid rules file raises a ConverterError, so that no Etherlink conversion runs with missing rules.
+
+Licence: EUPL 1.2 https://joinup.ec.europa.eu/sites/default/files/custom-page/attachment/2020-03/EUPL-1.2%20EN.txt
+Author: Vincent Poulain, 2022-2025
+'''
+
+from __future__ import annotations
+
+import json
+import os
+
+from typing import Callable, TextIO
+
+from koinly_converters.common import ConverterError, OutputLine, csvReader, logger, receivedFairAmount, toUnits
+
+
+ETHERLINK_RULES_FILE = os.path.join(os.path.dirname(__file__), 'etherlink_rules.json')
+
+
+def convert(xtzInputFile: TextIO, tokensInputFile: TextIO) -> list[OutputLine]:
+    return consolidateEtherlink(sorted(convertEtherlinkXtz(xtzInputFile) + convertEtherlinkTokens(tokensInputFile), key = lambda x: x.txDate))
+
+
+def convertEtherlinkXtz(inputFile: TextIO) -> list[OutputLine]:
+    reader = csvReader(inputFile, ',')
+    lines = []
+
+    def toXtz(amount: str) -> str:
+        return toUnits(amount, 18)
+
+    for row in reader:
+        txHash = row[0]
+        txDate = row[2]
+        fromAddress = row[3]
+        toAddress = row[4]        
+        txType = row[6]
+        amount = row[7]
+        fees = row[8]
+        status = row[9]
+        methodName = row[14]
+        currency = 'XTZ'
+
+        if status != 'ok':
+            logger.warning(f'Ignored transaction with status "{status}": {row}')
+            continue
+
+        sentAmount = None
+        sentCurrency = None
+        receivedAmount = None
+        receivedCurrency = None
+        feeAmount = None
+        feeCurrency = None
+        label = None
+        description = None        
+
+        if txType == 'IN':
+            receivedAmount = toXtz(amount)
+            receivedCurrency = currency
+            label = methodName if methodName == 'deposit' else None
+
+        elif txType == 'OUT':
+            sentAmount = toXtz(amount)
+            sentCurrency = currency
+            feeAmount = toXtz(fees)
+            feeCurrency = currency           
+            label = None
+
+        else:
+            logger.error(f'Unhandled txType: {txType}.')
+
+        description = f'{txType}{(" (" + methodName + ")") if len(methodName) > 0 else ""}: {fromAddress} to {toAddress}' 
+
+        lines.append(
+            OutputLine(
+                txDate = txDate,
+                sentAmount = sentAmount, sentCurrency = sentCurrency,
+                receivedAmount = receivedAmount, receivedCurrency = receivedCurrency,
+                feeAmount = feeAmount, feeCurrency = feeCurrency,
+                label = label,
+                description = description,
+                txHash = txHash
+            )
+        )
+
+    return lines
+
+
+def convertEtherlinkTokens(inputFile: TextIO) -> list[OutputLine]:
+    reader = csvReader(inputFile, ',')
+    lines = []
+    
+    for row in reader:
+        txHash = row[0]
+        txDate = row[2]
+        fromAddress = row[3]
+        toAddress = row[4]      
+        contractAddress = row[5]  
+        txType = row[6]
+        tokenDecimals = row[7]
+        tokenSymbol = row[8]
+        amount = row[9]
+        status = row[11]
+
+        if status != 'ok':
+            logger.warning(f'Ignored transfer with status "{status}": {row}')
+            continue
+
+        sentAmount = None
+        sentCurrency = None
+        receivedAmount = None
+        receivedCurrency = None
+        feeAmount = None
+        feeCurrency = None
+        label = None
+        description = None        
+
+        if len(tokenDecimals) == 0:
+            tokenDecimals = 0
+
+        if txType == 'IN':
+            receivedAmount = toUnits(amount, tokenDecimals)
+            receivedCurrency = tokenSymbol
+
+        elif txType == 'OUT':
+            sentAmount = toUnits(amount, tokenDecimals)
+            sentCurrency = tokenSymbol
+
+            wrapperPrefix = ETHERLINK_RULES.unwraps.get((contractAddress, toAddress))
+
+            if wrapperPrefix is not None and sentCurrency.startswith(wrapperPrefix):
+                receivedAmount = sentAmount
+                receivedCurrency = sentCurrency[len(wrapperPrefix):]
+                description = f'Unwrapped {sentAmount} {sentCurrency} to {receivedAmount} {receivedCurrency}'
+
+        else:
+            logger.error(f'Unhandled txType: {txType}.')
+
+        if label is None:
+            description = f'{txType}: {fromAddress} to {toAddress}' 
+
+        lines.append(
+            OutputLine(
+                txDate = txDate,
+                sentAmount = sentAmount, sentCurrency = sentCurrency,
+                receivedAmount = receivedAmount, receivedCurrency = receivedCurrency,
+                feeAmount = feeAmount, feeCurrency = feeCurrency,
+                label = label,
+                description = description,
+                txHash = txHash
+            )
+        )
+
+    return lines
+
+
+def getTxByIndex(txList: list[OutputLine], index: int) -> OutputLine:
+    try:
+        return txList[index]
+    
+    except IndexError:
+        return OutputLine(None, None, None, None, None)
+
+
+def consolidateWrapDeposit(txList: list[OutputLine], idx: int, rule: dict, consolidatedTxs: list[OutputLine]) -> int:
+    tx = txList[idx]
+    txBack = getTxByIndex(txList, idx + 1)
+
+    if (
+        txBack.txDate != tx.txDate or 
+        txBack.sentAmount is not None or 
+        txBack.sentCurrency is not None or 
+        not receivedFairAmount(txBack.receivedAmount, tx.sentAmount) or 
+        txBack.receivedCurrency != f'{rule["wrapperPrefix"]}{tx.sentCurrency}' or
+        txBack.txHash != tx.txHash
+    ):
+        logger.error(f'No consistent back transaction for OUT {rule["method"]}: {tx}')
+        consolidatedTxs.append(tx)
+
+        return 0
+
+    consolidatedTxs.append(OutputLine(
+            txDate = tx.txDate, 
+            sentAmount = tx.sentAmount, sentCurrency = tx.sentCurrency, 
+            receivedAmount = txBack.receivedAmount, receivedCurrency = txBack.receivedCurrency,
+            feeAmount = tx.feeAmount, feeCurrency = tx.feeCurrency, 
+            netWorthAmount = txBack.receivedAmount, netWorthCurrency = tx.sentCurrency,
+            label = '', description = f'Deposited {tx.sentAmount} {tx.sentCurrency}',
+            txHash = tx.txHash
+        )
+    )
+
+    return 1
+
+
+def consolidateSupply(txList: list[OutputLine], idx: int, rule: dict, consolidatedTxs: list[OutputLine]) -> int:
+    tx = txList[idx]
+    txBackA = getTxByIndex(txList, idx + 1)
+    txBackB = getTxByIndex(txList, idx + 2)
+
+    if (
+        txBackA.txDate != tx.txDate or txBackB.txDate != tx.txDate or
+        txBackA.sentAmount is None or 
+        txBackA.sentCurrency is None or 
+        not receivedFairAmount(txBackB.receivedAmount, txBackA.sentAmount) or 
+        txBackB.receivedCurrency != f'{rule["wrapperPrefix"]}{txBackA.sentCurrency}' or
+        txBackA.txHash != tx.txHash or txBackB.txHash != tx.txHash
+    ):
+        logger.error(f'No consistent back transactions for {rule["method"]}: {tx}')
+        consolidatedTxs.append(tx)
+
+        return 0
+
+    tx.description = f'Unlocked {txBackA.sentCurrency} for OUT {rule["method"]}'
+    consolidatedTxs.append(tx)
+
+    consolidatedTxs.append(OutputLine(
+            txDate = tx.txDate, 
+            sentAmount = txBackA.sentAmount, sentCurrency = txBackA.sentCurrency, 
+            receivedAmount = txBackB.receivedAmount, receivedCurrency = txBackB.receivedCurrency,
+            feeAmount = txBackA.feeAmount, feeCurrency = tx.feeCurrency, 
+            netWorthAmount = txBackA.receivedAmount, netWorthCurrency = tx.sentCurrency,
+            label = '', description = f'Supplied {txBackA.sentAmount} {txBackA.sentCurrency}',
+            txHash = tx.txHash
+        )
+    )
+
+    return 2
+
+
+def consolidateWrapWithdraw(txList: list[OutputLine], idx: int, rule: dict, consolidatedTxs: list[OutputLine]) -> int:
+    tx = txList[idx]
+    txBack = getTxByIndex(txList, idx + 1)
+
+    if (
+        txBack.txDate != tx.txDate or 
+        txBack.sentAmount is not None or 
+        txBack.sentCurrency is not None or 
+        txBack.receivedAmount is None or 
+        txBack.receivedCurrency != f'{rule["wrapperPrefix"]}{tx.sentCurrency}' or
+        txBack.txHash != tx.txHash
+    ):
+        logger.error(f'No consistent back transaction for OUT {rule["method"]}: {tx}')
+        consolidatedTxs.append(tx)
+
+        return 0
+
+    consolidatedTxs.append(OutputLine(
+            txDate = tx.txDate, 
+            sentAmount = tx.sentAmount, sentCurrency = tx.sentCurrency, 
+            receivedAmount = txBack.receivedAmount, receivedCurrency = txBack.receivedCurrency,
+            feeAmount = tx.feeAmount, feeCurrency = tx.feeCurrency, 
+            label = None, description = f'Unlocked {tx.sentCurrency} for redeem',
+            txHash = tx.txHash
+        )
+    )
+
+    return 1
+
+
+def consolidateWithdraw(txList: list[OutputLine], idx: int, rule: dict, consolidatedTxs: list[OutputLine]) -> int:
+    tx = txList[idx]
+    txBackA = getTxByIndex(txList, idx + 1)
+    txBackB = getTxByIndex(txList, idx + 2)
+    wrapperPrefix = rule['wrapperPrefix']
+
+    if (
+        txBackA.txDate != tx.txDate or txBackB.txDate != tx.txDate or
+        (txBackA.sentAmount is not None and (txBackA.sentCurrency != f'{wrapperPrefix}{txBackB.receivedCurrency}' or not receivedFairAmount(txBackB.receivedAmount, txBackA.sentAmount))) or
+        (txBackA.sentAmount is None and (txBackA.receivedCurrency != f'{wrapperPrefix}{txBackB.receivedCurrency}')) or
+        txBackB.receivedCurrency is None or
+        txBackA.txHash != tx.txHash or txBackB.txHash != tx.txHash
+    ):
+        logger.error(f'No consistent back transactions for {rule["method"]}: {tx}')
+        consolidatedTxs.append(tx)
+
+        return 0
+
+    if txBackA.sentAmount is None:
+        tx.description = f'Received {txBackA.receivedCurrency} interests during OUT withdrawal'
+        tx.sentAmount = 0
+        tx.receivedAmount = txBackA.receivedAmount
+        tx.receivedCurrency = txBackA.receivedCurrency    
+
+    else:
+        tx.description = f'Unlocked {txBackA.sentCurrency} for OUT withdrawal'
+
+    consolidatedTxs.append(tx)         
+
+    consolidatedTxs.append(OutputLine(
+            txDate = tx.txDate, 
+            sentAmount = txBackA.sentAmount, sentCurrency = txBackA.sentCurrency, 
+            receivedAmount = txBackB.receivedAmount, receivedCurrency = txBackB.receivedCurrency,
+            feeAmount = txBackA.feeAmount, feeCurrency = tx.feeCurrency, 
+            label = '', description = f'Redeemed {txBackB.receivedAmount} {txBackB.receivedCurrency}',
+            txHash = tx.txHash
+        )
+    )
+
+    return 2
+
+
+def consolidateSwap(txList: list[OutputLine], idx: int, rule: dict, consolidatedTxs: list[OutputLine]) -> int:
+    tx = txList[idx]
+    txBack = getTxByIndex(txList, idx + 1)
+
+    if (
+        txBack.txDate != tx.txDate or 
+        txBack.sentAmount is not None or 
+        txBack.sentCurrency is not None or 
+        txBack.receivedAmount is None or 
+        txBack.receivedCurrency == tx.receivedCurrency or
+        txBack.txHash != tx.txHash
+    ):
+        logger.error(f'No consistent back transaction for OUT {rule["method"]}: {tx}')
+        consolidatedTxs.append(tx)
+
+        return 0
+
+    consolidatedTxs.append(OutputLine(
+            txDate = tx.txDate, 
+            sentAmount = tx.sentAmount, sentCurrency = tx.sentCurrency, 
+            receivedAmount = txBack.receivedAmount, receivedCurrency = txBack.receivedCurrency,
+            feeAmount = tx.feeAmount, feeCurrency = tx.feeCurrency, 
+            label = '', description = f'Swapped {tx.sentAmount} {tx.sentCurrency} to {txBack.receivedAmount} {txBack.receivedCurrency}',
+            txHash = tx.txHash
+        )
+    )
+
+    return 1
+
+
+def consolidateBridge(txList: list[OutputLine], idx: int, rule: dict, consolidatedTxs: list[OutputLine]) -> int:
+    tx = txList[idx]
+    txBack = getTxByIndex(txList, idx + 1)
+
+    if (
+        txBack.txDate != tx.txDate or
+        tx.sentAmount is None or
+        tx.sentCurrency != rule['gasCurrency'] or
+        txBack.sentAmount is None or
+        txBack.sentCurrency is None or
+        txBack.txHash != tx.txHash
+    ):
+        logger.error(f'No consistent back transaction for OUT {rule["method"]}: {tx}')
+        consolidatedTxs.append(tx)
+
+        return 0
+
+    consolidatedTxs.append(OutputLine(
+            txDate = tx.txDate, 
+            sentAmount = None, sentCurrency = None,
+            receivedAmount = None, receivedCurrency = None,
+            feeAmount = tx.sentAmount, feeCurrency = tx.sentCurrency, 
+            label = None, description = f'Bridge foreign gas fees',
+            txHash = tx.txHash
+        )
+    )
+
+    consolidatedTxs.append(OutputLine(
+            txDate = tx.txDate, 
+            sentAmount = txBack.sentAmount, sentCurrency = txBack.sentCurrency,
+            receivedAmount = None, receivedCurrency = None,
+            label = None, description = f'Bridged out {txBack.sentAmount} {txBack.sentCurrency}',
+            txHash = tx.txHash
+        )
+    )
+
+    return 1
+
+
+def consolidateBuy(txList: list[OutputLine], idx: int, rule: dict, consolidatedTxs: list[OutputLine]) -> int:
+    tx = txList[idx]
+    txBackA = getTxByIndex(txList, idx + 1)
+    txBackB = getTxByIndex(txList, idx + 2)
+
+    if (
+        txBackA.txDate != tx.txDate or txBackB.txDate != tx.txDate or
+        txBackA.receivedAmount is None or 
+        txBackA.receivedCurrency not in rule['boughtCurrencies'] or 
+        txBackB.sentCurrency is None or
+        txBackB.sentAmount is None or
+        txBackA.txHash != tx.txHash or txBackB.txHash != tx.txHash
+    ):
+        logger.error(f'No consistent back transactions for OUT {rule["method"]}: {tx}')
+        consolidatedTxs.append(tx)
+
+        return 0
+
+    tx.description = f'Bought {txBackA.receivedCurrency}'
+    consolidatedTxs.append(OutputLine(
+            txDate = tx.txDate, 
+            sentAmount = txBackB.sentAmount, sentCurrency = txBackB.sentCurrency, 
+            receivedAmount = txBackA.receivedAmount, receivedCurrency = txBackA.receivedCurrency,
+            feeAmount = tx.feeAmount, feeCurrency = tx.feeCurrency, 
+            label = '', description = f'Bought {txBackA.receivedAmount} {txBackA.receivedCurrency}',
+            txHash = tx.txHash
+        )
+    )
+
+    return 2
+
+
+CONSOLIDATION_PATTERNS = {
+    'wrapDeposit': (consolidateWrapDeposit, ('wrapperPrefix',)),
+    'supply': (consolidateSupply, ('wrapperPrefix',)),
+    'wrapWithdraw': (consolidateWrapWithdraw, ('wrapperPrefix',)),
+    'withdraw': (consolidateWithdraw, ('wrapperPrefix',)),
+    'swap': (consolidateSwap, ()),
+    'bridge': (consolidateBridge, ('gasCurrency',)),
+    'buy': (consolidateBuy, ('boughtCurrencies',)),
+}
+
+
+STRING_PARAMETERS = ('wrapperPrefix', 'gasCurrency')
+STRING_LIST_PARAMETERS = ('contracts', 'routers', 'boughtCurrencies')
+
+
+class EtherlinkRules:
+    def __init__(self, unwraps: dict[tuple[str, str], str], consolidations: dict[str, tuple[Callable, dict]]) -> None:
+        self.unwraps = unwraps
+        self.consolidations = consolidations
+
+
+def ruleErrors(rule: dict, parameters: tuple[str, ...], context: str) -> list[str]:
+    errors = []
+
+    if not isinstance(rule, dict):
+        return [f'{context} is not an object']
+
+    for parameter in parameters:
+        value = rule.get(parameter)
+
+        if parameter not in rule:
+            errors.append(f'missing {parameter} for {context}')
+
+        elif parameter in STRING_PARAMETERS and not isinstance(value, str):
+            errors.append(f'{parameter} of {context} is not a string')
+
+        elif parameter in STRING_LIST_PARAMETERS and (not isinstance(value, list) or not all(isinstance(item, str) for item in value)):
+            errors.append(f'{parameter} of {context} is not a list of strings')
+
+    return errors
+
+
+def loadEtherlinkRules(filePath: str) -> EtherlinkRules:
+    with open(filePath, encoding = 'utf-8') as rulesFile:
+        try:
+            rules = json.load(rulesFile)
+
+        except json.JSONDecodeError as err:
+            raise ConverterError(f'Cannot parse the Etherlink rules file {filePath}: {err}.')
+
+    if not isinstance(rules, dict):
+        raise ConverterError(f'Invalid Etherlink rules file {filePath}: the top level is not an object.')
+
+    unwrapRules = rules.get('unwraps', [])
+    consolidationRules = rules.get('consolidations', {})
+    errors = []
+
+    if not isinstance(unwrapRules, list):
+        errors.append('unwraps is not a list')
+        unwrapRules = []
+
+    if not isinstance(consolidationRules, dict):
+        errors.append('consolidations is not an object')
+        consolidationRules = {}
+
+    unwraps = {}
+
+    for unwrap in unwrapRules:
+        unwrapErrors = ruleErrors(unwrap, ('contracts', 'routers', 'wrapperPrefix'), f'unwrap {unwrap}')
+        errors += unwrapErrors
+
+        if len(unwrapErrors) == 0:
+            for contract in unwrap['contracts']:
+                for router in unwrap['routers']:
+                    unwraps[(contract, router)] = unwrap['wrapperPrefix']
+
+    consolidations = {}
+
+    for method, consolidation in consolidationRules.items():
+        pattern = consolidation.get('pattern') if isinstance(consolidation, dict) else None
+
+        if pattern not in CONSOLIDATION_PATTERNS:
+            errors.append(f'unknown consolidation pattern "{pattern}" for method {method}')
+            continue
+
+        handler, parameters = CONSOLIDATION_PATTERNS[pattern]
+        consolidationErrors = ruleErrors(consolidation, parameters, f'method {method}')
+        errors += consolidationErrors
+
+        if len(consolidationErrors) == 0:
+            rule = {parameter: consolidation[parameter] for parameter in parameters}
+            rule['method'] = method
+
+            if 'boughtCurrencies' in rule:
+                rule['boughtCurrencies'] = frozenset(rule['boughtCurrencies'])
+
+            consolidations[method] = (handler, rule)
+
+    if len(errors) > 0:
+        raise ConverterError(f'Invalid Etherlink rules file {filePath}: {"; ".join(errors)}.')
+
+    return EtherlinkRules(unwraps, consolidations)
+
+
+ETHERLINK_RULES = loadEtherlinkRules(ETHERLINK_RULES_FILE)
+
+
+def outMethodName(description: str) -> str:
+    if not description.startswith('OUT ('):
+        return None
+    
+    end = description.find('):', 5)
+
+    return description[5:end] if end >= 0 else None
+
+
+def consolidateEtherlink(txList: list[OutputLine], rules: EtherlinkRules = None) -> list[OutputLine]:
+    consolidations = (rules or ETHERLINK_RULES).consolidations
+    consolidatedTxs = []
+    skipNext = 0
+
+    for idx in range(len(txList)):
+        tx = txList[idx]
+
+        if skipNext > 0:
+            skipNext -= 1
+            continue
+
+        consolidation = consolidations.get(outMethodName(tx.description))
+
+        if consolidation is None:
+            consolidatedTxs.append(tx)
+
+        else:
+            handler, rule = consolidation
+            skipNext = handler(txList, idx, rule, consolidatedTxs)
+
+    return consolidatedTxs
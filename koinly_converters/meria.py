@@ -0,0 +1,141 @@
+'''
+Koinly Convert plugin: Meria 'WaltioCSV' history files.
+
+Licence: EUPL 1.2 https://joinup.ec.europa.eu/sites/default/files/custom-page/attachment/2020-03/EUPL-1.2%20EN.txt
+Author: Vincent Poulain, 2022-2025
+'''
+
+from __future__ import annotations
+
+from typing import TextIO
+
+from koinly_converters.common import FIAT_BASE_CURRENCY, OutputLine, csvReader, logger
+
+
+def convert(inputFile: TextIO) -> list[OutputLine]:
+    return convertMeria(inputFile)
+
+
+def convertMeria(inputFile: TextIO) -> list[OutputLine]:
+    def unhandledTxInfoForTxTypeError(txType: str, txInfo: str):
+        logger.error(f'Unhandled txInfo for txType {txType}: {txInfo}.')
+
+    normalizeLunaTicker = lambda ticker : ticker if ticker != 'LUNA' else f'{ticker}2'
+
+    reader = csvReader(inputFile, ';')
+    lines = []
+
+    for row in reader:
+        txHash = row[0] if row[0] != 'n/a' else None
+        txType = row[1]
+        sourceAmount = row[2]
+        sourceCurrency = row[3]
+        destinationAmount = row[4]
+        destinationCurrency = row[5]
+        address = row[6]
+        memo = row[7]
+        destinationType = row[8]
+        feeMultiplier = float(row[9]) / 100.0
+        txInfo = row[10]
+        txDate = row[11]
+
+        sentAmount = None
+        sentCurrency = None
+        receivedAmount = None
+        receivedCurrency = None
+        feeAmount = None
+        feeCurrency = None
+        label = None
+        description = None
+
+        if txType == 'credit':
+            if txInfo in ('airdrop', 'deposit', 'order', 'reward', 'unstaking', 'resale'):
+                receivedAmount = destinationAmount
+                receivedCurrency = destinationCurrency
+
+                if feeMultiplier > 0:
+                    feeAmount = str(feeMultiplier * float(receivedAmount))
+                    feeCurrency = receivedCurrency
+
+                label = (
+                    'unstake' if txInfo in ('unstaking', 'resale') else 
+                        'liquidity in' if receivedCurrency == FIAT_BASE_CURRENCY else 
+                            txInfo
+                )
+
+            elif txInfo in ('claim'):
+                pass
+
+            else:
+                unhandledTxInfoForTxTypeError(txType, txInfo)
+
+        elif txType == 'debit':
+            if txInfo in ('masternode', 'order', 'reinvestment', 'staking'):
+                sentAmount = sourceAmount
+                sentCurrency = sourceCurrency
+
+                if feeMultiplier > 0:
+                    feeAmount = str(feeMultiplier * float(sentAmount))
+                    feeCurrency = sentCurrency
+
+                label = (
+                    'stake' if txInfo in ('masternode', 'reinvestment', 'staking') else 
+                        'cost' if txInfo in ('order') else 
+                            None
+                )             
+
+            else:
+                unhandledTxInfoForTxTypeError(txType, txInfo)
+
+        elif txType == 'exchange':
+            if sourceCurrency == destinationCurrency:
+                continue
+            
+            if txInfo == '':
+                sentAmount = sourceAmount
+                sentCurrency = sourceCurrency
+
+                receivedAmount = destinationAmount
+                receivedCurrency = destinationCurrency
+
+                if feeMultiplier > 0:
+                    feeAmount = str(feeMultiplier * float(sentAmount))
+                    feeCurrency = sentCurrency
+
+                label = ''
+
+            else:
+                unhandledTxInfoForTxTypeError(txType, txInfo)
+
+        elif txType == 'withdraw':
+            if txInfo == '':
+                sentAmount = sourceAmount
+                sentCurrency = sourceCurrency
+
+                if feeMultiplier > 0:
+                    feeAmount = str(feeMultiplier * float(sentAmount))
+                    feeCurrency = sentCurrency
+
+                description = f'{destinationType} {address} {memo}'
+                label = ''
+
+            else:
+                unhandledTxInfoForTxTypeError(txType, txInfo)
+
+        else:
+            logger.error(f'Unhandled txType: {txType}.')
+
+        if label is not None:
+            lines.append(
+                OutputLine(
+                    txDate = txDate,
+                    sentAmount = sentAmount, sentCurrency = normalizeLunaTicker(sentCurrency),
+                    receivedAmount = receivedAmount, receivedCurrency = normalizeLunaTicker(receivedCurrency),
+                    feeAmount = feeAmount, feeCurrency = normalizeLunaTicker(feeCurrency),
+                    label = label,
+                    description = description,
+                    txHash = txHash
+                )
+            )
+
+    return lines